@@ -0,0 +1,108 @@
+'''Fuzzes ext/embedspec against the old brace scanner from Utility.to_embed
+and times both on the same corpus.
+
+The fuzz corpus is random specs plus malformed ones (unterminated braces,
+stray | and :, huge values), the only exception compile() may raise is
+EmbedSpecError and well formed specs must tokenize to what the old parser
+saw.
+
+Run from the repo root: python -m bench.embedspec
+'''
+import random
+import timeit
+
+from ext import embedspec
+
+
+KEYS = ['title', 'description', 'desc', 'color', 'colour', 'url', 'author', 'icon', 'field',
+        'value', 'inline', 'thumbnail', 'image', 'footer', 'timestamp', 'Title', 'junk']
+VALUES = ['Hello', 'some text here', '#ff0000', 'random', 'false', 'true', 'https://x.y/a.png',
+          'a: b', 'x' * 300, '']
+NOISE = '{}|: abc#'
+
+
+def old_parts(string):
+    # the old get_parts, with the IndexError on a missing } it used to have
+    for i, char in enumerate(string):
+        if char == "{":
+            ret = ""
+            while char != "}":
+                i += 1
+                char = string[i]
+                ret += char
+            yield ret.rstrip('}')
+
+
+def old_field(string):
+    ret = {}
+    parts = string.split(':')
+    ret[parts[0].strip().lower()] = ':'.join(parts[1:]).strip()
+    if '|' in string:
+        for part in string.split('|'):
+            ret.update(old_field(part))
+    return ret
+
+
+def old_parse(string):
+    return [old_field(part) for part in old_parts(string)]
+
+
+def spec(rng):
+    sections = []
+    for _ in range(rng.randint(1, 6)):
+        pairs = [f'{rng.choice(KEYS)}: {rng.choice(VALUES)}' for _ in range(rng.randint(1, 4))]
+        sections.append('{' + ' | '.join(pairs) + '}')
+    return ' '.join(sections)
+
+
+def mangle(rng, text):
+    text = list(text)
+    for _ in range(rng.randint(1, 4)):
+        pos = rng.randrange(len(text) + 1)
+        if text and rng.random() < 0.5:
+            del text[pos - 1]
+        else:
+            text.insert(pos, rng.choice(NOISE))
+    return ''.join(text)
+
+
+def corpus(count=2000, seed=0):
+    rng = random.Random(seed)
+    specs = [spec(rng) for _ in range(count)]
+    return specs, [mangle(rng, s) for s in specs]
+
+
+def fuzz(specs, mangled):
+    for text in specs:
+        new = [dict(section) for section in embedspec.tokenize(text)]
+        assert new == old_parse(text), text
+
+    valid, errors = [], 0
+    for text in specs + mangled:
+        try:
+            embedspec.compile(text)
+        except embedspec.EmbedSpecError:
+            errors += 1
+        else:
+            valid.append(text)
+    return valid, errors
+
+
+def main(number=20):
+    specs, mangled = corpus()
+    valid, errors = fuzz(specs, mangled)
+    print(f'fuzzed {len(specs) + len(mangled)} specs, {errors} rejected with EmbedSpecError, no crashes')
+
+    old = timeit.timeit(lambda: [old_parse(s) for s in specs], number=number) / number / len(specs) * 1e6
+    new = timeit.timeit(lambda: [embedspec.tokenize(s) for s in specs], number=number) / number / len(specs) * 1e6
+    embedspec.compile.cache_clear()
+    compiled = timeit.timeit(lambda: [embedspec.compile.__wrapped__(s) for s in valid],
+                             number=number) / number / len(valid) * 1e6
+    cached = timeit.timeit(lambda: [embedspec.compile(s) for s in valid[:200]],
+                           number=number * 10) / number / 10 / 200 * 1e6
+    print(f'old parser {old:6.2f}us/spec   tokenize {new:6.2f}us/spec')
+    print(f'compile {compiled:6.2f}us/spec   cached compile {cached:6.2f}us/spec')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,71 @@
+'''difflib scorers vs the bit-parallel ones in ext/fuzzy, per pair, for
+a full rtfm sized extract (with and without FuzzyIndex) and score_many over
+a big guild's worth of member names.
+
+Run from the repo root: python -m bench.fuzzy
+'''
+import random
+import timeit
+
+from ext import fuzzy
+
+
+WORDS = ['Message', 'edit', 'Client', 'Guild', 'channel', 'send', 'TextChannel', 'abc',
+         'Messageable', 'history', 'Member', 'roles', 'Permissions', 'Colour', 'Embed',
+         'add_field', 'VoiceClient', 'commands', 'Bot', 'Context', 'invoke', 'fetch_user']
+
+PAIRS = [
+    ('difflib ratio', fuzzy.ratio, fuzzy.lcs_ratio, fuzzy.lev_ratio),
+    ('partial ratio', fuzzy.partial_ratio, fuzzy.partial_lcs_ratio, fuzzy.partial_lev_ratio),
+]
+
+
+def anchors(count=3000, seed=0):
+    rng = random.Random(seed)
+    return {'.'.join(rng.choice(WORDS) for _ in range(rng.randint(1, 3))) + str(i): i
+            for i in range(count)}
+
+
+def main(number=2000):
+    rng = random.Random(1)
+    keys = list(anchors())
+    pairs = [(rng.choice(WORDS) + '.' + rng.choice(WORDS), rng.choice(keys)) for _ in range(50)]
+
+    print(f'{"per pair":<16} {"difflib":>10} {"lcs":>10} {"levenshtein":>12}')
+    for name, old, lcs, lev in PAIRS:
+        times = [timeit.timeit(lambda: [f(a, b) for a, b in pairs], number=number // 50) / number * 1e6
+                 for f in (old, lcs, lev)]
+        print(f'{name:<16} {times[0]:8.2f}us {times[1]:8.2f}us {times[2]:10.2f}us')
+
+    choices = anchors()
+    index = fuzzy.FuzzyIndex(choices)
+    queries = ['Message.edit', 'msg edit', 'TextChannel.send', 'guild members', 'fetch user']
+    print(f'\nextract_or_exact over {len(choices)} anchors, token sort, limit 5')
+    for algorithm in ('difflib', 'lcs', 'levenshtein'):
+        def flat():
+            for q in queries:
+                fuzzy.extract_or_exact(q, choices, scorer=fuzzy.token_sort_ratio, limit=5,
+                                       score_cutoff=50, algorithm=algorithm)
+
+        def indexed():
+            for q in queries:
+                index.extract_or_exact(q, scorer=fuzzy.token_sort_ratio, limit=5,
+                                       score_cutoff=50, algorithm=algorithm)
+
+        old = timeit.timeit(flat, number=3) / 3 / len(queries) * 1e3
+        new = timeit.timeit(indexed, number=3) / 3 / len(queries) * 1e3
+        print(f'{algorithm:<12} extract {old:7.2f}ms/query   FuzzyIndex {new:7.2f}ms/query')
+
+    names = [''.join(rng.choice('abcdefghijklmnopqrstuvwxyz _') for _ in range(rng.randint(2, 32)))
+             for _ in range(50000)]
+    index = fuzzy.FuzzyIndex(names)
+    index.score_many('warm up')
+    old = timeit.timeit(lambda: fuzzy.extract('some name', names, scorer=fuzzy.lcs_ratio, limit=5), number=3) / 3
+    new = timeit.timeit(lambda: index.score_many('some name', limit=5), number=3) / 3
+    backend = 'numpy' if fuzzy.np is not None else 'pure python'
+    print(f'\n{len(names)} member names, lcs_ratio top 5')
+    print(f'extract {old * 1e3:7.2f}ms   score_many ({backend}) {new * 1e3:7.2f}ms')
+
+
+if __name__ == '__main__':
+    main()
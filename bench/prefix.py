@@ -0,0 +1,46 @@
+'''Per message cost of resolving the prefix, old get_pre vs PrefixResolver,
+and of rejecting a non-command before a context gets built.
+
+Run from the repo root: python -m bench.prefix
+'''
+import json
+import os
+import tempfile
+import timeit
+
+from util.prefixes import PrefixResolver
+
+
+def old_get_pre(path):
+    # what LinuClient.get_pre used to do for every message
+    with open(path) as f:
+        prefix = json.load(f).get('PREFIX')
+    return os.environ.get('PREFIX') or prefix
+
+
+def main(number=20000):
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, 'config.json')
+        config = {
+            'TOKEN': 'your_token_here',
+            'PREFIX': 'linu ',
+            'PREFIXES': {str(i): f'{i}!' for i in range(1000)},
+        }
+        with open(path, 'w') as f:
+            json.dump(config, f, indent=4)
+
+        resolver = PrefixResolver(path)
+        resolver.set_user_id(488973326883094541)
+
+        old = timeit.timeit(lambda: old_get_pre(path), number=number)
+        new = timeit.timeit(lambda: resolver.get(500), number=number)
+        reject = timeit.timeit(lambda: resolver.matches('just chatting, not a command', 500), number=number)
+
+    print(f'old get_pre: {old / number * 1e6:8.2f} us/message')
+    print(f'resolver:    {new / number * 1e6:8.2f} us/message')
+    print(f'speedup:     {old / new:8.0f}x')
+    print(f'pre-filter:  {reject / number * 1e6:8.2f} us/message to reject a non-command')
+
+
+if __name__ == '__main__':
+    main()
@@ -8,7 +8,7 @@ import sys
 from asyncio.subprocess import PIPE
 from discord.ext import commands
 from io import BytesIO
-from util import repo, default, http, dataIO
+from util import repo, default, http, dataIO, cache, metrics
 from util.chat_formatting import pagify, box
 from ext import embedtobox
 code = "```py\n{0}\n```"
@@ -61,7 +61,7 @@ class Admin:
             try: 
                 await user.send(message)
                 return await linu.author.send(
-                    f"Alright, I've sent the following to `{_u}`..."
+                    f"Alright, I've sent the following to `{_u}`...",
                     embed=discord.Embed(
                         description = message, 
                         colour=0xFFA500,
@@ -181,7 +181,7 @@ class Admin:
         if linu.author.id == 309025661031415809:
             return await linu.send(f"Yes **{linu.author.name}** of course your admin, your my owner :grin:")
 
-        if linu.author.id in self.config.owners:
+        if repo.acl.is_owner(linu.author.id) or repo.acl.is_admin(linu.author.id):
             return await linu.send(f"Yes **{linu.author.name}** you are admin rank! ✅")
 
 
@@ -207,6 +207,84 @@ class Admin:
         time.sleep(1)
         await self.bot.logout()
 
+    @commands.command(hidden=True)
+    @commands.check(repo.is_owner)
+    async def cachestats(self, linu):
+        """ Hit, miss and eviction stats for every cache """
+        for page in pagify(cache.format_stats() or "No caches yet", ['\n']):
+            await linu.send(box(page))
+
+    @commands.command(hidden=True)
+    @commands.check(repo.is_owner)
+    async def latency(self, linu):
+        """ Latency percentiles of the commands that track them """
+        for page in pagify(metrics.format_histograms() or "Nothing recorded yet", ['\n']):
+            await linu.send(box(page))
+
+    @commands.command(name='metrics', hidden=True)
+    @commands.check(repo.is_owner)
+    async def show_metrics(self, linu):
+        """ Every counter, gauge and histogram with its 1m/1h/24h rollups """
+        parts = [metrics.format_counters(), metrics.format_gauges()]
+        parts += [metrics.format_histograms(window) for window in metrics.WINDOWS]
+        text = '\n\n'.join(part for part in parts if part)
+        for page in pagify(text or "Nothing recorded yet", ['\n']):
+            await linu.send(box(page))
+
+    @commands.command(hidden=True)
+    @commands.check(repo.is_owner)
+    async def slowest(self, linu, n: int = 10):
+        """ The n slowest commands by p95, and the slow log """
+        for page in pagify(self.bot.timings.format_slowest(n) or "Nothing recorded yet", ['\n']):
+            await linu.send(box(page))
+
+    @commands.command(hidden=True)
+    @commands.check(repo.is_owner)
+    async def httpstats(self, linu):
+        """ Connection pool usage of the shared http client """
+        stats = http.client.stats()
+        msg = (f"In use: {stats['in_use']}/{stats['limit']} ({stats['saturation']:.0%}) waiting: {stats['waiting']}\n"
+               f"Requests: {stats['requests']} retries: {stats['retries']} errors: {stats['errors']}")
+        for host, h in sorted(stats['hosts'].items(), key=lambda x: x[1]['saturation'], reverse=True):
+            msg += f"\n{host}: {h['active']} active {h['waiting']} waiting ({h['saturation']:.0%})"
+        if http.client.disk is not None:
+            disk = http.client.disk.stats()
+            msg += (f"\nDisk cache: {disk['bytes'] / 1024**2:.1f}/{disk['max_bytes'] / 1024**2:.0f} MB, "
+                    f"{disk['hits']} hits {disk['misses']} misses {disk['revalidated']} revalidated {disk['evictions']} evicted")
+        await linu.send(box(msg))
+
+    @commands.command(hidden=True)
+    @commands.check(repo.is_owner)
+    async def startup(self, linu):
+        """ How long each cog and its imports took to load """
+        for page in pagify(self.bot.cogloader.format_report(imports=10), ['\n']):
+            await linu.send(box(page))
+
+    @commands.command(hidden=True, aliases=["relacl"])
+    @commands.check(repo.is_owner)
+    async def reloadacl(self, linu):
+        """ Reloads owners, helpers, admins and the blacklist """
+        repo.acl.reload()
+        acl = repo.acl.snapshot
+        await linu.send(f"Reloaded, **{len(acl.owners)}** owners **{len(acl.helpers)}** helpers **{len(acl.admins)}** admins **{len(acl.blacklist)}** blacklisted")
+
+    @commands.command(hidden=True)
+    @commands.check(repo.is_owner)
+    async def blacklist(self, linu, user_id: int):
+        """ Blacklists a user id, use it again to unblacklist """
+        if repo.acl.is_blacklisted(user_id):
+            await repo.acl.blacklist_remove(user_id)
+            return await linu.send(f"Unblacklisted **{user_id}**")
+        await repo.acl.blacklist_add(user_id)
+        await linu.send(f"Blacklisted **{user_id}**")
+
+    @commands.command(hidden=True, aliases=["relprefix"])
+    @commands.check(repo.is_owner)
+    async def reloadprefixes(self, linu):
+        """ Reloads the global prefix from data/config.json and the server prefixes """
+        self.bot.prefixes.reload()
+        await linu.send(f"Reloaded prefixes, **{len(self.bot.prefixes.active)}** active")
+
     @commands.command(hidden=True)
     @commands.check(repo.is_owner)
     async def load(self, linu, name: str):
@@ -299,7 +377,8 @@ class Admin:
         try:
             bio = await http.get(
                 url,
-                res_method="read")
+                res_method="read",
+                no_cache=True)
             await self.bot.user.edit(avatar=bio)
             await linu.send(f"Successfully changed the avatar. Currently using:\n{url}")
         except aiohttp.InvalidURL:
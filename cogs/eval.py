@@ -1,7 +1,7 @@
 import time
 import datetime
 import subprocess
-from util import repo, default, http
+from util import repo, default, http, metrics
 from util.chat_formatting import pagify, box
 from ext import embedtobox
 from discord.ext import commands
@@ -73,6 +73,7 @@ class evalc:
             'os': os,
             'emote':  self.emotes,
             'counter': count,
+            'metrics': metrics,
             '_': self._last_result
         }
 
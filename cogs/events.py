@@ -5,10 +5,9 @@ import os
 import random
 import asyncio
 
-from collections import Counter
 from datetime import datetime
 from discord.ext.commands import errors
-from util import default, permissions
+from util import default, permissions, metrics
 from ext import fuzzy
 from ext import embedtobox
 from PIL import Image
@@ -29,15 +28,30 @@ class Events:
     def __init__(self, bot):
         self.bot = bot
         self.process = psutil.Process(os.getpid())
-        self.totalmembers = set({})
-        self.counter = Counter()
+        self.commands_ran = metrics.counter('commands_ran')
+        self.messages_read = metrics.counter('messages_read')
 
 
     def gettotalusers(self): # oof not alot of users
-        for x in self.bot.guilds:
-            for y in x.members:
-                self.totalmembers.add(y.id)
-        return len(self.totalmembers) 
+        return len(self.bot.usercount)
+
+    async def on_member_join(self, member):
+        self.bot.usercount.add(member.id)
+        self.bot.presence.touch()
+
+    async def on_member_remove(self, member):
+        self.bot.usercount.remove(member.id)
+        self.bot.presence.touch()
+
+    async def on_guild_role_create(self, role):
+        self.bot.role_indexes.invalidate(role.guild)
+
+    async def on_guild_role_delete(self, role):
+        self.bot.role_indexes.invalidate(role.guild)
+
+    async def on_guild_role_update(self, before, after):
+        if before.name != after.name:
+            self.bot.role_indexes.invalidate(after.guild)
 
 
     async def on_command_error(self, linu, err): #  g e t   c l a p p e d   e r r o r s
@@ -77,7 +91,7 @@ class Events:
             )
             embed.set_footer(text=f'Linu#4795') 
             await linu.send(embed=embed) # u s e r   f r i e n d l y
-            self.bot.counter["errors"] += 1 # oof so many errors
+            metrics.counter('errors').inc() # oof so many errors
 
 
 
@@ -99,12 +113,13 @@ class Events:
             )
             embed.set_footer(text='sorry'.format(linu.author)) 
             await linu.send(embed=embed, delete_after=5) # delete after 5 seconds so it dont flood chat
-            self.bot.counter["ratelimits"] += 1 # get ratelimited
+            metrics.counter('ratelimits').inc() # get ratelimited
 
         elif isinstance(err, errors.CommandNotFound):
             pass # so it dont give errors if you try to do a command thats not a command
 
     async def on_guild_join(self, guild):
+        self.bot.usercount.add_guild(guild)
         members = set(guild.members)
         bots = filter(lambda m: m.bot, members)
         bots = set(bots)
@@ -130,7 +145,7 @@ class Events:
         join = discord.Embed(title="Added to Guild", description=f"» Name: {guild.name}\n» ID: {guild.id}\n» Reigion: {guild.region}\n» Members/Bots: `{members}:{len(bots)}`\n» Owner: {guild.owner}{sketchy_msg}\n", color=discord.Color.dark_green())
         join.set_thumbnail(url=guild.icon_url)
         join.set_footer(text=f"Total Guilds: {len(self.bot.guilds)}")
-        await self.bot.change_presence(activity=discord.Game(type=0, name=f"with {self.gettotalusers()} users  | linu help"), status=discord.Status.online)
+        self.bot.presence.touch()
         try:
             channel = self.bot.get_channel(492376070767509523)
             await channel.send(embed=leave)
@@ -138,6 +153,8 @@ class Events:
             print(e)
 
     async def on_guild_remove(self, guild):
+        self.bot.usercount.remove_guild(guild)
+        self.bot.role_indexes.invalidate(guild)
         members = set(guild.members)
         bots = filter(lambda m: m.bot, members)
         bots = set(bots)
@@ -145,7 +162,7 @@ class Events:
         leave = discord.Embed(title="Removed from Guild", description=f"» Name: {guild.name}\n» ID: {guild.id}\n» Region: {guild.region}\n» Members/Bots: `{members}:{len(bots)}`\n» Owner: {guild.owner}", color=discord.Color.dark_red())
         leave.set_thumbnail(url=guild.icon_url)
         leave.set_footer(text=f"Total Guilds: {len(self.bot.guilds)}")
-        await self.bot.change_presence(activity=discord.Game(type=0, name=f"with {self.gettotalusers()} users  | linu help"), status=discord.Status.online)
+        self.bot.presence.touch()
         try:
             channel = self.bot.get_channel(492376070767509523)
             await channel.send(embed=leave)
@@ -162,11 +179,11 @@ class Events:
             return # go away bots
 
         await self.bot.process_commands(after) # p r o c e s   t h o s e   c o m m a n d s
-        self.bot.counter["commands_ran"] += 1 # adds one to counter 
+        self.commands_ran.inc() # adds one to counter 
 
     async def on_message(self, message):
         """Every message sent (that the bot can see) adds one to the counter"""
-        self.bot.counter["messages_read"] += 1 # adds one to counter
+        self.messages_read.inc() # adds one to counter
 
 
 
@@ -175,8 +192,10 @@ class Events:
         """When bot is ready it will print how many server and users it is in and set the uptime"""
         if not hasattr(self.bot, 'uptime'):
             self.bot.uptime = datetime.utcnow()
-        await self.bot.change_presence(activity=discord.Game(type=0, name=f"with {self.gettotalusers()} users  | linu help"), status=discord.Status.online)
-        print(f'Servers: {len(self.bot.guilds)} | Users: {len(set(self.bot.get_all_members()))}')
+        self.bot.usercount.rebuild(self.bot.guilds)
+        self.bot.presence.touch()
+        await self.bot.presence.flush(force=True)
+        print(f'Servers: {len(self.bot.guilds)} | Users: {self.gettotalusers()}')
         print('---------------')
 
 
@@ -185,7 +204,7 @@ class Events:
 
     async def on_command(self, linu):
         """Adds one to the counter every command its runs"""
-        self.bot.counter["commands_ran"] += 1
+        self.commands_ran.inc()
 
 
 
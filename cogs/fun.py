@@ -23,11 +23,9 @@ class Fun_Commands:
             return
         isVideo = True
         while isVideo:
-            async with aiohttp.ClientSession() as cs:
-                async with cs.get('https://api.computerfreaker.cf/v1/hug') as resp:
-                    res = await resp.json()
-                    res = res['url']
-                    cs.close()
+            # no_cache, every call should give a new random hug
+            res = await http.get('https://api.computerfreaker.cf/v1/hug', res_method="json", no_cache=True)
+            res = res['url']
             if res.endswith('.mp4'):
                 pass
             else:
@@ -82,7 +80,7 @@ class Fun_Commands:
     @commands.cooldown(rate=1, per=1.5, type=commands.BucketType.user)
     async def rate(self, linu, *, thing: commands.clean_content):
         """ Rates what you desire """
-        return await linu.send(f"I'd rate {thing} a **", str(round(random.uniform(0,100),2), "/ 100**") # simplified this command
+        return await linu.send(f"I'd rate {thing} a **{round(random.uniform(0,100),2)} / 100**") # simplified this command
 
     @commands.command(aliases=['slots', 'bet'])
     @commands.cooldown(rate=1, per=3.0, type=commands.BucketType.user)
@@ -91,14 +89,14 @@ class Fun_Commands:
         emojis = "🍎🍊🍐🍋🍉🍇🍓🍒"
         rolled = [random.choice(emojis) for i in range(3)] # changed three variables to one tuple
 
-        if all(c == c[0] for c in rolled): # check tuple and see if all values are alike
+        if all(c == rolled[0] for c in rolled): # check tuple and see if all values are alike
             message = 'and won! 🎉'
-        elif len(set(n)) == 2: # checks to see if there are two items in the set, two would mean there's 2 different emojis in the list
+        elif len(set(rolled)) == 2: # checks to see if there are two items in the set, two would mean there's 2 different emojis in the list
             message = 'and almost won (2/3)'
         else: 
             message = 'and lost...'
 
-        result = f"**{linu.author.name}** rolled the slots...\n**[ ", str() f"{a} {b} {c} ]**\n{message}"
+        result = f"**{linu.author.name}** rolled the slots...\n**[ {' '.join(rolled)} ]**\n{message}"
         await linu.send(result)
 
 def setup(bot):
@@ -28,6 +28,7 @@ import re
 from io import BytesIO
 from discord.ext import commands
 from util import permissions, default
+from ext import fuzzy
 from ext import embedtobox
 
 
@@ -61,6 +62,17 @@ class ActionReason(commands.Converter):
         return ret
 
 
+def find_role(guild, name, indexes):
+    '''First role with the name in it, else the closest name if it's close enough.'''
+    name = name.lower()
+    role = discord.utils.find(lambda r: name in r.name.lower(), guild.roles)
+    if role is not None:
+        return role
+    # lcs_ratio against the guild's cached index, vectorized when numpy is installed
+    _, best = indexes.get(guild).score_many(name, limit=1, score_cutoff=70)
+    return best[0][2] if best else None
+
+
 class Moderator:
     def __init__(self, bot):
         self.bot = bot
@@ -80,6 +92,16 @@ class Moderator:
 
 
 
+    @commands.command()
+    @commands.guild_only()
+    @permissions.has_permissions(manage_guild=True)
+    async def prefix(self, linu, *, prefix: str = None):
+        """ Sets the prefix for this server, leave it empty to reset it. """
+        await self.bot.prefixes.set(linu.guild.id, prefix)
+        if prefix is None:
+            return await linu.send("Reset the prefix for this server")
+        await linu.send(f"Changed the prefix for this server to **{prefix}**")
+
     @commands.command(aliases=["nick"])
     @commands.guild_only()
     @commands.cooldown(rate=1, per=1.5, type=commands.BucketType.user)
@@ -205,7 +227,7 @@ class Moderator:
         if rolename is None:
             linu.send("Give a role please")
 
-        role = discord.utils.find(lambda m: rolename.lower() in m.name.lower(), linu.message.guild.roles)
+        role = find_role(linu.guild, rolename, self.bot.role_indexes)
         if not role:
             return await linu.send('That role does not exist.')
         try:
@@ -220,7 +242,7 @@ class Moderator:
     @permissions.has_permissions(manage_roles=True)
     async def removerole(self, linu, member: discord.Member, *, rolename: str):
         '''Remove a role from someone else.'''
-        role = discord.utils.find(lambda m: rolename.lower() in m.name.lower(), linu.message.guild.roles)
+        role = find_role(linu.guild, rolename, self.bot.role_indexes)
         if not role:
             return await linu.send('That role does not exist.')
         try:
@@ -21,24 +21,27 @@ from ext import embedtobox
 from util.chat_formatting import pagify, box
 from discord.ext import commands
 from datetime import datetime
-from util import repo, default
+from util import repo, default, cache, metrics
 from discord import Webhook, AsyncWebhookAdapter
-from collections import Counter
 
 class Information2:
     def __init__(self, bot):
         self.bot = bot
         self.process = psutil.Process(os.getpid())
-        self.totalmembers = set({})
-        self.counter = Counter()
 
 
 
+    def counter_stats(self):
+        '''Since last restart, and in the last hour'''
+        lines = []
+        for name, label in (('ratelimits', 'People ratelimited'), ('commands_ran', 'Commands ran'),
+                            ('messages_read', 'Messages read'), ('prefilter_rejected', 'Messages skipped before parsing')):
+            counter = metrics.counter(name)
+            lines.append(f"{label}: {counter.value} ({counter.total('1h'):.0f} in the last hour)")
+        return '\n'.join(lines)
+
     def gettotalusers(self):
-        for x in self.bot.guilds:
-            for y in x.members:
-                self.totalmembers.add(y.id)
-        return len(self.totalmembers) 
+        return len(self.bot.usercount)
 
 
     def get_bot_uptime(self, *, brief=False):
@@ -90,7 +93,12 @@ The heartbeat ping {round(self.bot.latency * 500)}ms
             value=len([x.name for x in self.bot.commands]), inline=True)
         embed.add_field(
             name="Some counter stats",
-            value=f"People ratelimited(Since last restart) " + str(self.bot.counter["ratelimits"]) + "\nCommands ran(since last restart) " + str(self.bot.counter["commands_ran"]) + "\nMessages read(Since last restart) " + str(self.bot.counter["messages_read"]) + " ", inline=False)
+            value=self.counter_stats(), inline=False)
+        stores = [c.stats() for c in cache.caches]
+        hits, misses = sum(c['hits'] for c in stores), sum(c['misses'] for c in stores)
+        embed.add_field(
+            name="Cache",
+            value=f"{sum(c['size'] for c in stores)} entries, {hits} hits {misses} misses ({hits / ((hits + misses) or 1):.0%} hit rate)", inline=False)
         embed.add_field(
             name="Library",
             value="discord.py [rewrite]", inline=True)
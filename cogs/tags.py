@@ -30,12 +30,11 @@ import random
 import json
 import os
 import io
-from util import default
+from util import default, repo
 
 class tags:
     def __init__(self, bot):
         self.bot = bot
-        self.channel = default.get("data/channels.json")
 
 
     @commands.command()
@@ -45,11 +44,9 @@ class tags:
             return await linu.send(
                 "You cant leave this blank"
                 )
-        with open('data/tags.json', 'r') as f:
-            s = f.read()
-            tags = json.loads(s)
-        if text in tags:
-            await linu.send(f'{tags[str(text)]}')
+        tag = self.bot.storage.get("tags", text)
+        if tag is not None:
+            await linu.send(f'{tag}')
         else:
 
             e = discord.Embed()
@@ -81,7 +78,9 @@ class tags:
             name=author_name,
             icon_url=linu.message.author.avatar_url)
 
-        channel=self.bot.get_channel(int(self.channel.tag)) 
+        channel=self.bot.get_channel(int(self.bot.storage.get("channels", "tag") or 0))
+        if channel is None:
+            return await linu.send("Tag requests aren't set up on this bot")
         await channel.send(
             embed=em)
 
@@ -91,5 +90,22 @@ class tags:
         await linu.send(
             embed=em)
 
+    @commands.command(hidden=True)
+    @commands.check(repo.is_owner)
+    async def tagset(self, linu, name: str, *, content: str=None):
+        """Adds or edits a tag, leave the content empty to delete it"""
+        if content is None:
+            await self.bot.storage.delete("tags", name)
+            return await linu.send(f"Deleted the tag **{name}**")
+        await self.bot.storage.set("tags", name, content)
+        await linu.send(f"Saved the tag **{name}**")
+
+    @commands.command(hidden=True)
+    @commands.check(repo.is_owner)
+    async def tagchannel(self, linu):
+        """Sends tag requests to this channel"""
+        await self.bot.storage.set("channels", "tag", str(linu.channel.id))
+        await linu.send(f"Tag requests will go to **{linu.channel.name}**")
+
 def setup(bot):
     bot.add_cog(tags(bot))
@@ -23,18 +23,18 @@ from discord.ext import commands
 from discord.ext.commands import TextChannelConverter
 from contextlib import redirect_stdout
 from ext.utility import load_json
-from urllib.parse import quote as uriquote
-from mtranslate import translate
-from lxml import etree
-from ext import fuzzy
-from ext import embedtobox
+from ext import fuzzy, google
+from ext import embedtobox, embedspec
+from util import http, repo, metrics, polls
+from util.translate import translator
+from util.rtfm import RTFMIndex
 from PIL import Image
 import unicodedata
 import traceback
 import textwrap
 import aiohttp
 import inspect
-import asyncio
+import copy
 import time
 import re
 import io
@@ -49,17 +49,22 @@ class Utility:
 
     def __init__(self, bot):
         self.bot = bot
-        self.lang_conv = load_json('data/langs.json')
         self._last_embed = None
-        self._rtfm_cache = None
+        self.rtfm_index = RTFMIndex()
+        self.rtfm_index.start(self.bot.loop)
         self._last_google = None
         self._last_result = None
 
+    def __unload(self):
+        self.rtfm_index.stop()
+
 
     @commands.command(name='help')
     async def new_help_command(self, linu, *commands: str):
         """Shows this message."""
         destination = linu.message.author if self.bot.pm_help else linu.message.channel
+        # in lazy mode the full command list isn't there until every cog is loaded
+        self.bot.cogloader.load_all()
 
         def repl(obj):
             return self.bot._mentions_transforms.get(obj.group(0), '')
@@ -131,12 +136,12 @@ class Utility:
     @commands.group(aliases=['trans'])
     async def translate(self, ctx, lang, *, text):
         """Translate text!"""
-        conv = self.lang_conv
-        if lang in conv:
-            return await ctx.send(f'*{translate(text, lang)}*')
-        lang = dict(zip(conv.values(), conv.keys())).get(lang.lower().title())
+        lang = translator.languages.resolve(lang)
         if lang:
-            await ctx.send(f'*{translate(text, lang)}*')
+            try:
+                await ctx.send(f'*{await translator.translate(text, lang)}*')
+            except Exception:
+                return await ctx.send('`Translation failed, try again later.`', delete_after=5)
         else:
             await ctx.send('`Language not available.`', delete_after=5)
         try:
@@ -147,7 +152,7 @@ class Utility:
     @commands.command()
     async def langs(self, ctx):
         '''Lists all available languages'''
-        codes = self.lang_conv
+        codes = translator.languages.names
         em = discord.Embed(color=discord.Color.blue(),
                            title='Available Languages',
                            description=', '.join(codes.values()))
@@ -157,9 +162,17 @@ class Utility:
     @commands.command(pass_context=True)
     @commands.cooldown(rate=1, per=3.0, type=commands.BucketType.user)
     async def embed(self, linu, *, edescription: str):
-        """makes you a embed"""
-        embed = discord.Embed(description=edescription, color=0x36393e)
-        embed.set_footer(text='Requested by:\n{0}'.format(linu.author))
+        """makes you a embed, {title: ... | color: ...} {field: ... | value: ...} sections work too"""
+        embed = None
+        spec = edescription.strip()
+        if spec.startswith('{') and spec.endswith('}'):
+            try:
+                embed = self.to_embed(linu, spec)
+            except embedspec.EmbedSpecError as e:
+                return await linu.send(f'Bad embed: {e}')
+        if embed is None:
+            embed = discord.Embed(description=edescription, color=0x36393e)
+            embed.set_footer(text='Requested by:\n{0}'.format(linu.author))
         try:
             await linu.message.delete()
             await linu.send(
@@ -178,146 +191,43 @@ class Utility:
         """
         await self.do_rtfm(linu, 'rewrite', obj)
 
+    @rtfm.command(name='python', aliases=['py'])
+    async def rtfm_python(self, linu, *, obj: str = None):
+        """Gives you a documentation link for a Python entity."""
+        await self.do_rtfm(linu, 'python', obj)
+
+    @rtfm.command(name='aiohttp')
+    async def rtfm_aiohttp(self, linu, *, obj: str = None):
+        """Gives you a documentation link for an aiohttp entity."""
+        await self.do_rtfm(linu, 'aiohttp', obj)
 
-    async def to_embed(self, linu, params):
-        '''Actually formats the parsed parameters into an Embed'''
-        em = discord.Embed()
-
-        if not params.count('{'):
-            if not params.count('}'):
-                em.description = params
-
-        for field in self.get_parts(params):
-            data = self.parse_field(field)
-
-            color = data.get('color') or data.get('colour')
-            if color == 'random':
-                em.color = random.randint(0, 0xFFFFFF)
-            elif color == 'chosen':
-                maybe_col = os.environ.get('COLOR')
-                if maybe_col:
-                    raw = int(maybe_col.strip('#'), 16)
-                    return discord.Color(value=raw)
-                else:
-                    return await linu.send('Chosen color is not defined.')
-
-            elif color:
-                color = int(color.strip('#'), 16)
-                em.color = discord.Color(color)
-
-            if data.get('description'):
-                em.description = data['description']
-
-            if data.get('desc'):
-                em.description = data['desc']
-
-            if data.get('title'):
-                em.title = data['title']
-
-            if data.get('url'):
-                em.url = data['url']
-
-            author = data.get('author')
-            icon, url = data.get('icon'), data.get('url')
-
-            if author:
-                em._author = {'name': author}
-                if icon:
-                    em._author['icon_url'] = icon
-                if url:
-                    em._author['url'] = url
-
-            field, value = data.get('field'), data.get('value')
-            inline = False if str(data.get('inline')).lower() == 'false' else True
-            if field and value:
-                em.add_field(name=field, value=value, inline=inline)
-
-            if data.get('thumbnail'):
-                em._thumbnail = {'url': data['thumbnail']}
-
-            if data.get('image'):
-                em._image = {'url': data['image']}
-
-            if data.get('footer'):
-                em._footer = {'text': data.get('footer')}
-                if data.get('icon'):
-                    em._footer['icon_url'] = data.get('icon')
-
-            if 'timestamp' in data.keys() and len(data.keys()) == 1:
-                em.timestamp = linu.message.created_at
-
-        return em
-
-    def get_parts(self, string):
-        '''
-        Splits the sections of the embed command
-        '''
-        for i, char in enumerate(string):
-            if char == "{":
-                ret = ""
-                while char != "}":
-                    i += 1
-                    char = string[i]
-                    ret += char
-                yield ret.rstrip('}')
-
-    def parse_field(self, string):
-        '''
-        Recursive function to get all the key val
-        pairs in each section of the parsed embed command
-        '''
-        ret = {}
-
-        parts = string.split(':')
-        key = parts[0].strip().lower()
-        val = ':'.join(parts[1:]).strip()
-
-        ret[key] = val
-
-        if '|' in string:
-            string = string.split('|')
-            for part in string:
-                ret.update(self.parse_field(part))
-        return ret
-
-    async def build_rtfm_lookup_table(self):
-        cache = {}
-
-        page_types = {
-            'rewrite': (
-                'http://discordpy.rtfd.io/en/rewrite/api.html',
-                'http://discordpy.rtfd.io/en/rewrite/ext/commands/api.html'
-            )
-        }
-
-        for key, pages in page_types.items():
-            sub = cache[key] = {}
-            for page in pages:
-                async with self.bot.session.get(page) as resp:
-                    if resp.status != 200:
-                        raise RuntimeError('Cannot build rtfm lookup table, try again later.')
-
-                    text = await resp.text(encoding='utf-8')
-                    root = etree.fromstring(text, etree.HTMLParser())
-                    if root is not None:
-                        nodes = root.findall(".//dt/a[@class='headerlink']")
-                        for node in nodes:
-                            href = node.get('href', '')
-                            as_key = href.replace('#discord.', '').replace('ext.commands.', '')
-                            sub[as_key] = page + href
-
-        self._rtfm_cache = cache
+    @rtfm.command(name='refresh', hidden=True)
+    @commands.check(repo.is_owner)
+    async def rtfm_refresh(self, linu):
+        """Refetches every documentation index."""
+        await linu.trigger_typing()
+        done = await self.rtfm_index.refresh(force=True)
+        await linu.send(f"Refreshed {', '.join(p for p in done if not self.rtfm_index.stale(p)) or 'nothing'}")
+
+
+    def to_embed(self, linu, params):
+        '''Formats an embed spec into an Embed, raises EmbedSpecError if it's bad'''
+        template = embedspec.compile(params, f'Requested by:\n{linu.author}')
+        return template.build(linu.message.created_at)
 
     async def do_rtfm(self, linu, key, obj):
-        base_url = 'http://discordpy.rtfd.io/en/{}/'.format(key)
+        base_url = self.rtfm_index.projects[key][0]
 
         if obj is None:
             await linu.send(base_url)
             return
 
-        if not self._rtfm_cache:
+        if key not in self.rtfm_index.indexes:
             await linu.trigger_typing()
-            await self.build_rtfm_lookup_table()
+        try:
+            index = await self.rtfm_index.get(key)
+        except RuntimeError as e:
+            return await linu.send(e)
 
         # identifiers don't have spaces
         obj = obj.replace(' ', '_')
@@ -348,9 +258,8 @@ class Utility:
                                           for k in pit_of_success_helpers.keys()))
             obj = pattern.sub(replace, obj)
 
-        cache = self._rtfm_cache[key]
-        matches = fuzzy.extract_or_exact(
-            obj, cache, scorer=fuzzy.token_sort_ratio, limit=5, score_cutoff=50)
+        matches = index.extract_or_exact(
+            obj, scorer=fuzzy.token_sort_ratio, limit=5, score_cutoff=50)
 
         e = discord.Embed(colour=discord.Colour.blurple())
         if len(matches) == 0:
@@ -359,296 +268,19 @@ class Utility:
         e.description = '\n'.join('[{}]({}) ({}%)'.format(key, url, p) for key, p, url in matches)
         await linu.send(embed=e)
 
-    def parse_google_card(self, node):
-        e = discord.Embed(colour=discord.Colour.blurple())
-
-        # check if it's a calculator card:
-        calculator = node.find(".//span[@class='cwclet']")
-        if calculator is not None:
-            e.title = 'Calculator'
-            result = node.find(".//span[@class='cwcot']")
-            if result is not None:
-                result = ' '.join((calculator.text, result.text.strip()))
-            else:
-                result = calculator.text + ' ???'
-            e.description = result
-            return e
-
-        # check for unit conversion card
-
-        unit_conversions = node.xpath(".//input[contains(@class, '_eif') and @value]")
-        if len(unit_conversions) == 2:
-            e.title = 'Unit Conversion'
-
-            # the <input> contains our values, first value = second value essentially.
-            # these <input> also have siblings with <select> and <option selected=1>
-            # that denote what units we're using
-
-            # We will get 2 <option selected="1"> nodes by traversing the parent
-            # The first unit being converted (e.g. Miles)
-            # The second unit being converted (e.g. Feet)
-
-            xpath = etree.XPath("parent::div/select/option[@selected='1']/text()")
-            try:
-                first_node = unit_conversions[0]
-                first_unit = xpath(first_node)[0]
-                first_value = float(first_node.get('value'))
-                second_node = unit_conversions[1]
-                second_unit = xpath(second_node)[0]
-                second_value = float(second_node.get('value'))
-                e.description = ' '.join(
-                    (str(first_value), first_unit, '=', str(second_value), second_unit))
-            except Exception:
-                return None
-            else:
-                return e
-
-        # check for currency conversion card
-        if 'currency' in node.get('class', ''):
-            currency_selectors = node.xpath(".//div[@class='ccw_unit_selector_cnt']")
-            if len(currency_selectors) == 2:
-                e.title = 'Currency Conversion'
-                # Inside this <div> is a <select> with <option selected="1"> nodes
-                # just like the unit conversion card.
-
-                first_node = currency_selectors[0]
-                first_currency = first_node.find("./select/option[@selected='1']")
-
-                second_node = currency_selectors[1]
-                second_currency = second_node.find("./select/option[@selected='1']")
-
-                # The parent of the nodes have a <input class='vk_gy vk_sh ccw_data' value=...>
-                xpath = etree.XPath("parent::td/parent::tr/td/input[@class='vk_gy vk_sh ccw_data']")
-                try:
-                    first_value = float(xpath(first_node)[0].get('value'))
-                    second_value = float(xpath(second_node)[0].get('value'))
-
-                    values = (
-                        str(first_value),
-                        first_currency.text,
-                        f'({first_currency.get("value")})',
-                        '=',
-                        str(second_value),
-                        second_currency.text,
-                        f'({second_currency.get("value")})'
-                    )
-                    e.description = ' '.join(values)
-                except Exception:
-                    return None
-                else:
-                    return e
-
-        # check for generic information card
-        info = node.find(".//div[@class='_f2g']")
-        if info is not None:
-            try:
-                e.title = ''.join(info.itertext()).strip()
-                actual_information = info.xpath(
-                    "parent::div/parent::div//div[@class='_XWk' or contains(@class, 'kpd-ans')]")[0]
-                e.description = ''.join(actual_information.itertext()).strip()
-            except Exception:
-                return None
-            else:
-                return e
-
-        # check for translation card
-        translation = node.find(".//div[@id='tw-ob']")
-        if translation is not None:
-            src_text = translation.find(".//pre[@id='tw-source-text']/span")
-            src_lang = translation.find(".//select[@id='tw-sl']/option[@selected='1']")
-
-            dest_text = translation.find(".//pre[@id='tw-target-text']/span")
-            dest_lang = translation.find(".//select[@id='tw-tl']/option[@selected='1']")
-
-            # TODO: bilingual dictionary nonsense?
-
-            e.title = 'Translation'
-            try:
-                e.add_field(name=src_lang.text, value=src_text.text, inline=True)
-                e.add_field(name=dest_lang.text, value=dest_text.text, inline=True)
-            except Exception:
-                return None
-            else:
-                return e
-
-        # check for "time in" card
-        time = node.find("./div[@class='vk_bk vk_ans']")
-        if time is not None:
-            date = node.find("./div[@class='vk_gy vk_sh']")
-            try:
-                e.title = node.find('span').text
-                e.description = f'{time.text}\n{"".join(date.itertext()).strip()}'
-            except Exception:
-                return None
-            else:
-                return e
-
-        # time in has an alternative form without spans
-        time = node.find("./div/div[@class='vk_bk vk_ans _nEd']")
-        if time is not None:
-            converted = "".join(time.itertext()).strip()
-            try:
-                # remove the in-between text
-                parent = time.getparent()
-                parent.remove(time)
-                original = "".join(parent.itertext()).strip()
-                e.title = 'Time Conversion'
-                e.description = f'{original}...\n{converted}'
-            except Exception:
-                return None
-            else:
-                return e
-
-        # check for definition card
-        words = node.xpath(".//span[@data-dobid='hdw']")
-        if words:
-            lex = etree.XPath(".//div[@class='lr_dct_sf_h']/i/span")
-
-            # this one is derived if we were based on the position from lex
-            xpath = etree.XPath("../../../ol[@class='lr_dct_sf_sens']//"
-                                "div[not(@class and @class='lr_dct_sf_subsen')]/"
-                                "div[@class='_Jig']/div[@data-dobid='dfn']/span")
-            for word in words:
-                # we must go two parents up to get the root node
-                root = word.getparent().getparent()
-
-                pronunciation = root.find(".//span[@class='lr_dct_ph']/span")
-                if pronunciation is None:
-                    continue
-
-                lexical_category = lex(root)
-                definitions = xpath(root)
-
-                for category in lexical_category:
-                    definitions = xpath(category)
-                    try:
-                        descrip = [f'*{category.text}*']
-                        for index, value in enumerate(definitions, 1):
-                            descrip.append(f'{index}. {value.text}')
-
-                        e.add_field(name=f'{word.text} /{pronunciation.text}/',
-                                    value='\n'.join(descrip))
-                    except:
-                        continue
-
-            return e
-
-        # check for weather card
-        location = node.find("./div[@id='wob_loc']")
-        if location is None:
-            return None
-
-        # these units should be metric
-
-        date = node.find("./div[@id='wob_dts']")
-
-        # <img alt="category here" src="cool image">
-        category = node.find(".//img[@id='wob_tci']")
-
-        xpath = etree.XPath(
-            ".//div[@id='wob_d']//div[contains(@class, 'vk_bk')]//span[@class='wob_t']")
-        temperatures = xpath(node)
-
-        misc_info_node = node.find(".//div[@class='vk_gy vk_sh wob-dtl']")
-
-        if misc_info_node is None:
-            return None
-
-        precipitation = misc_info_node.find("./div/span[@id='wob_pp']")
-        humidity = misc_info_node.find("./div/span[@id='wob_hm']")
-        wind = misc_info_node.find("./div/span/span[@id='wob_tws']")
-
-        try:
-            e.title = 'Weather for ' + location.text.strip()
-            e.description = f'*{category.get("alt")}*'
-            e.set_thumbnail(url='https:' + category.get('src'))
-
-            if len(temperatures) == 4:
-                first_unit = temperatures[0].text + temperatures[2].text
-                second_unit = temperatures[1].text + temperatures[3].text
-                units = f'{first_unit} | {second_unit}'
-            else:
-                units = 'Unknown'
-
-            e.add_field(name='Temperature', value=units, inline=False)
-
-            if precipitation is not None:
-                e.add_field(name='Precipitation', value=precipitation.text)
-
-            if humidity is not None:
-                e.add_field(name='Humidity', value=humidity.text)
-
-            if wind is not None:
-                e.add_field(name='Wind', value=wind.text)
-        except:
-            return None
-
-        return e
-
     async def get_google_entries(self, query):
-        url = f'https://www.google.com/search?q={uriquote(query)}'
-        params = {
-            'safe': 'on',
-            'lr': 'lang_en',
-            'hl': 'en'
-        }
-
-        headers = {
-            'User-Agent': 'Mozilla/5.0 (Windows NT 6.3; Win64; x64) Gecko/20100101 Firefox/53.0'
-        }
-
-        # list of URLs and title tuples
-        entries = []
-
-        # the result of a google card, an embed
-        card = None
-
-        async with self.bot.session.get(url, params=params, headers=headers) as resp:
-            if resp.status != 200:
-                #log.info('Google failed to respond with %s status code.', resp.status)
-                raise RuntimeError('Google has failed to respond.')
-
-            root = etree.fromstring(await resp.text(), etree.HTMLParser())
-
-            # for bad in root.xpath('//style'):
-            #     bad.getparent().remove(bad)
-
-            # for bad in root.xpath('//script'):
-            #     bad.getparent().remove(bad)
-
-            # with open('google.html', 'w', encoding='utf-8') as f:
-            #     f.write(etree.tostring(root, pretty_print=True).decode('utf-8'))
-
-            """
-            Tree looks like this.. sort of..
-            <div class="rc">
-                <h3 class="r">
-                    <a href="url here">title here</a>
-                </h3>
-            </div>
-            """
-
-            card_node = root.xpath(".//div[@id='rso']/div[@class='_NId']//"
-                                   "div[contains(@class, 'vk_c') or @class='g mnr-c g-blk' or @class='kp-blk']")
-
-            if card_node is None or len(card_node) == 0:
-                card = None
-            else:
-                card = self.parse_google_card(card_node[0])
-
-            search_results = root.findall(".//div[@class='rc']")
-            # print(len(search_results))
-            for node in search_results:
-                link = node.find("./h3[@class='r']/a")
-                if link is not None:
-                    # print(etree.tostring(link, pretty_print=True).decode())
-                    entries.append((link.get('href'), link.text))
-
-        return card, entries
+        try:
+            return await google.search(query)
+        except aiohttp.ClientError:
+            raise RuntimeError('Google has failed to respond.')
 
     @commands.command(aliases=['g'])
     async def google(self, linu, *, query):
         """Searches google and gives you top result."""
+        with metrics.histogram('google').time():
+            await self.send_google(linu, query)
+
+    async def send_google(self, linu, query):
         await linu.trigger_typing()
         try:
             card, entries = await self.get_google_entries(query)
@@ -656,6 +288,8 @@ class Utility:
             await linu.send(str(e))
         else:
             if card:
+                # cached results are shared, don't add the links to everyone's copy
+                card = copy.deepcopy(card)
                 value = '\n'.join(f'[{title}]({url.replace(")", "%29")})' for url,
                                   title in entries[:3])
                 if value:
@@ -744,38 +378,17 @@ class Utility:
             time = int(time.strip("time="))
         else:
             time = 30
-        emoji = ['1⃣', '2⃣', '3⃣', '4⃣', '5⃣', '6⃣', '7⃣', '8⃣', '9⃣']
         to_react = []
         confirmation_msg = "**{}?**:\n\n".format(options[0].rstrip("?"))
         for idx, option in enumerate(options[1:]):
-            confirmation_msg += "{} - {}\n".format(emoji[idx], option)
-            to_react.append(emoji[idx])
+            confirmation_msg += "{} - {}\n".format(polls.EMOJI[idx], option)
+            to_react.append(polls.EMOJI[idx])
         confirmation_msg += "\n\nYou have {} seconds to vote!".format(time)
         poll_msg = await linu.send(confirmation_msg)
+        # the votes are counted from reaction events and the poll manager posts the results
+        await self.bot.polls.open(poll_msg, options[0], options[1:], time)
         for emote in to_react:
             await poll_msg.add_reaction(emote)
-        await asyncio.sleep(time)
-        async for message in linu.message.channel.history():
-            if message.id == poll_msg.id:
-                poll_msg = message
-        results = {}
-        for reaction in poll_msg.reactions:
-            if reaction.emoji in to_react:
-                results[reaction.emoji] = reaction.count - 1
-        end_msg = "The poll is over. The results:\n\n"
-        for result in results:
-            end_msg += "{} {} - {} votes\n".format(result, options[emoji.index(result)+1], results[result])
-        top_result = max(results, key=lambda key: results[key])
-        if len([x for x in results if results[x] == results[top_result]]) > 1:
-            top_results = []
-            for key, value in results.items():
-                if value == results[top_result]:
-                    top_results.append(options[emoji.index(key)+1])
-            end_msg += "\nThe victory is tied between: {}".format(", ".join(top_results))
-        else:
-            top_result = options[emoji.index(top_result)+1]
-            end_msg += "\n{} is the winner!".format(top_result)
-        await linu.send(end_msg)
 
 def setup(bot):
     bot.add_cog(Utility(bot))
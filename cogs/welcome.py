@@ -27,21 +27,14 @@ class welcome:
 
     async def on_member_join(self, member):
 
-        guild = member.guild
-        welcome_path = Path(f"data/welcome/{guild.id}.json")
-        if welcome_path.is_file():
-            welcome_config = default.get(f'data/welcome/{guild.id}.json')
-            welcome_message = welcome_config.welcome_message
-            channel_dest = int(welcome_config.channel)
-            channel = self.bot.get_channel(channel_dest)
-            embed = discord.Embed( 
-                description=welcome_message,
-                color=0x36393e)
-            await channel.send(embed=embed)
-
- 
-        else:
-            pass
+        welcome_config = self.bot.storage.get("welcome", member.guild.id)
+        if welcome_config is None:
+            return
+        channel = self.bot.get_channel(int(welcome_config["channel"]))
+        embed = discord.Embed(
+            description=welcome_config["welcome_message"],
+            color=0x36393e)
+        await channel.send(embed=embed)
 
 
 
@@ -66,15 +59,12 @@ class welcome:
     @welcome.command(name="create")
     async def start(self, linu):
         """  Creates a json welcome for you!  """
-        fileopen = r"data/welcome/" + str(linu.guild.id) + ".json"
-        file = open(fileopen, "w", encoding="utf-8")
         data = {}
         data["guild"] = f"NAME={linu.guild.name} ID={linu.guild.id} OWNER={linu.guild.owner}"
         data["welcome_message"] = "Not specified"
         data["channel"] = f"{linu.channel.id}"
         data["user"] = "ID: " + str(linu.message.author.id) +  " Username: " + str(linu.message.author.name) + "#" + str(linu.message.author.discriminator) + " <<< Creator"
-        json.dump(data, file, ensure_ascii=False)
-        file.close()
+        await self.bot.storage.set("welcome", linu.guild.id, data)
         embed = discord.Embed(
             title="Welcomer",
             description=f"Welcomer has started! Remember to use an id when editing the channel\nWelcomer has been set to {linu.channel.name} by default",
@@ -103,18 +93,14 @@ class welcome:
     async def message(self, linu, *args):
         """Sets welcome message"""
         try:
-            fileopen = r"data/welcome/" + str(linu.guild.id) + ".json"
-            file = open(fileopen, "r", encoding="utf-8")
-            predata = json.load(file)
+            predata = self.bot.storage.get("welcome", linu.guild.id) or {}
             prechannel = predata["channel"]
-            file = open(fileopen, "w", encoding="utf-8")
             data = {}
             data["guild"] = f"NAME={linu.guild.name} ID={linu.guild.id} OWNER={linu.guild.owner}"
             data["welcome_message"] = " ".join(args).replace("/{}/g", " ")
             data["channel"] = prechannel
             data["user"] = "ID: " + str(linu.message.author.id) +  " Username: " + str(linu.message.author.name) + "#" + str(linu.message.author.discriminator) + " <<< Creator"
-            json.dump(data, file, ensure_ascii=False)
-            file.close()
+            await self.bot.storage.set("welcome", linu.guild.id, data)
             profilem = discord.Embed(
                 title=f"The message was edited",
                 description=f"Your welcome message has been edited, if any errors pop up just contact my owner.",
@@ -134,18 +120,14 @@ class welcome:
     async def channel(self, linu, *args):
         """sets channel"""
         try:
-            fileopen = r"data/welcome/" + str(linu.guild.id) + ".json"
-            file = open(fileopen, "r", encoding="utf-8")
-            predata = json.load(file)
+            predata = self.bot.storage.get("welcome", linu.guild.id) or {}
             prewelcome = predata["welcome_message"]
-            file = open(fileopen, "w", encoding="utf-8")
             data = {}
             data["guild"] = f"NAME={linu.guild.name} ID={linu.guild.id} OWNER={linu.guild.owner}"
             data["welcome_message"] = prewelcome
             data["channel"] = " ".join(args).replace("/{}/g", " ")
             data["user"] = "ID: " + str(linu.message.author.id) +  " Username: " + str(linu.message.author.name) + "#" + str(linu.message.author.discriminator) + " <<< Creator"
-            json.dump(data, file, ensure_ascii=False)
-            file.close()
+            await self.bot.storage.set("welcome", linu.guild.id, data)
             profilem = discord.Embed(
                 title=f"channel changed",
                 description=f"Your Welcomer channel has been changed",
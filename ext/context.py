@@ -1,20 +1,35 @@
 import discord
 from discord.ext import commands
 import asyncio
-from colorthief import ColorThief
 from urllib.parse import urlparse
 import io
 import os
 import base64
 from ext.formatter import EmbedHelp
+from util import http, cache
 
 
+# avatar urls change with the avatar, so the colour can be kept for a while
+_colors = cache.LRUCache(maxsize=2048, ttl=6 * 3600, name='dominant colours')
+cache.caches.append(_colors)
+
+
+def _dominant_color(image, quality):
+    from colorthief import ColorThief # pulls in PIL, only load it when needed
+    with io.BytesIO(image) as f:
+        return ColorThief(f).get_color(quality=quality)
+
 
 class CustomContext(commands.Context):
     '''Custom Context class to provide utility.'''
-    def __init__(self, **kwargs):
-        super().__init__(**kwargs)
-        self.formatter = EmbedHelp()
+    _formatter = None
+
+    @property
+    def formatter(self):
+        '''Only built when something actually needs it'''
+        if self._formatter is None:
+            self._formatter = EmbedHelp()
+        return self._formatter
 
     @property
     def session(self):
@@ -94,19 +109,25 @@ class CustomContext(commands.Context):
 
         if not self.is_valid_image_url(url):
             raise ValueError('Invalid image url passed.')
+        key = (str(url), quality)
+        color = _colors.get(key)
+        if color is not None:
+            return color
         try:
-            async with self.session.get(url) as resp:
-                image = await resp.read()
+            # only the colour is worth keeping, not the image bytes
+            image = await http.get(str(url), res_method='read', raise_for_status=True, no_cache=True)
         except:
             return discord.Color.default()
 
-        with io.BytesIO(image) as f:
-            try:
-                color = ColorThief(f).get_color(quality=quality)
-            except:
-                return discord.Color.dark_grey()
-            
-        return discord.Color.from_rgb(*color)
+        try:
+            # PIL work, keep it off the loop
+            rgb = await self.bot.loop.run_in_executor(None, _dominant_color, image, quality)
+        except:
+            return discord.Color.dark_grey()
+
+        color = discord.Color.from_rgb(*rgb)
+        _colors.set(key, color)
+        return color
 
     async def success(self, msg=None, delete=False):
         if delete:
@@ -0,0 +1,196 @@
+'''The little embed language used by the embed command.
+
+    {title: Hello | color: #ff0000} {field: Name | value: Text | inline: false}
+    {author: Someone | icon: https://... | url: https://...} {timestamp}
+
+Every {section} is a list of key: value pairs split by |. A spec is read in
+one pass, checked against Discord's limits and compiled into a Template
+that builds the Embed, identical specs reuse the compiled template.
+'''
+
+import os
+import random
+import discord
+
+from functools import lru_cache
+
+
+# Discord's limits
+LIMITS = {
+    'title': 256,
+    'description': 2048,
+    'author': 256,
+    'field': 256,
+    'value': 1024,
+    'footer': 2048,
+}
+MAX_FIELDS = 25
+MAX_TOTAL = 6000
+
+
+class EmbedSpecError(Exception):
+    pass
+
+
+def tokenize(spec):
+    '''Splits a spec into sections of (key, value) pairs, one pass over the text.
+
+    Text outside the braces is ignored, a spec without any braces is
+    the description.
+    '''
+    if '{' not in spec and '}' not in spec:
+        return [[('description', spec)]]
+
+    sections = []
+    section = None
+    start = 0
+    for i, char in enumerate(spec):
+        if section is None:
+            if char == '{':
+                section, start = [], i + 1
+        elif char == '|' or char == '}':
+            key, _, value = spec[start:i].partition(':')
+            section.append((key.strip().lower(), value.strip()))
+            start = i + 1
+            if char == '}':
+                sections.append(section)
+                section = None
+    if section is not None:
+        raise EmbedSpecError(f'Unterminated section at character {start}, missing a }}')
+    return sections
+
+
+def _color(value):
+    if value in ('random', 'chosen'):
+        return value
+    try:
+        color = int(value.strip('#'), 16)
+    except ValueError:
+        color = -1
+    if not 0 <= color <= 0xFFFFFF:
+        raise EmbedSpecError(f'{value} is not a hex colour')
+    return color
+
+
+class Template:
+    '''A compiled spec, build() makes a fresh Embed from it.
+
+    footer is added as a line under the spec's own footer before the limits
+    are checked, so it's never what gets cut off.
+    '''
+
+    __slots__ = ('title', 'description', 'url', 'color', 'author', 'fields',
+                 'thumbnail', 'image', 'footer', 'timestamp')
+
+    def __init__(self, sections, footer=None):
+        self.title = self.description = self.url = self.color = None
+        self.author = self.thumbnail = self.image = self.footer = None
+        self.fields = []
+        self.timestamp = False
+
+        for section in sections:
+            data = dict(section)
+            color = data.get('color') or data.get('colour')
+            if color:
+                self.color = _color(color)
+            for key in ('description', 'desc'):
+                if data.get(key):
+                    self.description = data[key]
+            if data.get('title'):
+                self.title = data['title']
+            if data.get('url'):
+                self.url = data['url']
+            if data.get('author'):
+                self.author = (data['author'], data.get('icon') or None, data.get('url') or None)
+            if data.get('field') and data.get('value'):
+                inline = data.get('inline', '').lower() != 'false'
+                self.fields.append((data['field'], data['value'], inline))
+            if data.get('thumbnail'):
+                self.thumbnail = data['thumbnail']
+            if data.get('image'):
+                self.image = data['image']
+            if data.get('footer'):
+                self.footer = (data['footer'], data.get('icon') or None)
+            if list(data) == ['timestamp']:
+                self.timestamp = True
+
+        if not (self.title or self.description or self.author or self.footer
+                or self.fields or self.image or self.thumbnail):
+            raise EmbedSpecError('There is nothing to put in the embed')
+        if footer:
+            text, icon = self.footer or ('', None)
+            self.footer = (f'{text}\n{footer}' if text else footer, icon)
+        self.validate()
+
+    def validate(self):
+        '''Raises EmbedSpecError if Discord would refuse the embed.'''
+        texts = [('title', self.title), ('description', self.description)]
+        if self.author:
+            texts.append(('author', self.author[0]))
+        if self.footer:
+            texts.append(('footer', self.footer[0]))
+        for name, value, _ in self.fields:
+            texts.append(('field', name))
+            texts.append(('value', value))
+
+        total = 0
+        for kind, text in texts:
+            if text is None:
+                continue
+            if len(text) > LIMITS[kind]:
+                raise EmbedSpecError(f'The {kind} is {len(text)} characters, the limit is {LIMITS[kind]}')
+            total += len(text)
+        if len(self.fields) > MAX_FIELDS:
+            raise EmbedSpecError(f'{len(self.fields)} fields, the limit is {MAX_FIELDS}')
+        if total > MAX_TOTAL:
+            raise EmbedSpecError(f'The embed is {total} characters, the limit is {MAX_TOTAL}')
+
+    def build(self, timestamp=None):
+        '''Makes the Embed, timestamp is used if the spec has a {timestamp} section.'''
+        em = discord.Embed()
+        if self.title:
+            em.title = self.title
+        if self.description:
+            em.description = self.description
+        if self.url:
+            em.url = self.url
+
+        if self.color == 'random':
+            em.color = random.randint(0, 0xFFFFFF)
+        elif self.color == 'chosen':
+            maybe_col = os.environ.get('COLOR')
+            if not maybe_col:
+                raise EmbedSpecError('Chosen color is not defined.')
+            em.color = discord.Color(int(maybe_col.strip('#'), 16))
+        elif self.color is not None:
+            em.color = discord.Color(self.color)
+
+        if self.author:
+            name, icon, url = self.author
+            kwargs = {'name': name}
+            if icon:
+                kwargs['icon_url'] = icon
+            if url:
+                kwargs['url'] = url
+            em.set_author(**kwargs)
+        for name, value, inline in self.fields:
+            em.add_field(name=name, value=value, inline=inline)
+        if self.thumbnail:
+            em.set_thumbnail(url=self.thumbnail)
+        if self.image:
+            em.set_image(url=self.image)
+        if self.footer:
+            text, icon = self.footer
+            if icon:
+                em.set_footer(text=text, icon_url=icon)
+            else:
+                em.set_footer(text=text)
+        if self.timestamp and timestamp is not None:
+            em.timestamp = timestamp
+        return em
+
+
+@lru_cache(maxsize=256)
+def compile(spec, footer=None):
+    '''Parses and validates a spec, raises EmbedSpecError if it's bad. footer is appended to the spec's footer.'''
+    return Template(tokenize(spec), footer)
@@ -24,12 +24,43 @@ DEALINGS IN THE SOFTWARE.
 import itertools
 import inspect
 import asyncio
+import copy
 import discord
 from discord.ext import commands
 from discord.ext.commands.core import GroupMixin, Command
 from discord.ext.commands.errors import CommandError
 from discord.ext.commands import HelpFormatter
 
+from util import cache
+from util.acl import acl
+
+
+# rendered help pages, shared by every formatter. The bot clears it when cogs change.
+pages = cache.LRUCache(maxsize=256, name='help pages')
+cache.caches.append(pages)
+
+
+def invalidate():
+    pages.clear()
+
+
+def permission_signature(ctx):
+    '''Everything the command checks in this bot look at, so two people with
+    the same signature are shown the same help.'''
+    if isinstance(ctx.channel, discord.abc.PrivateChannel):
+        return ('dm', acl.is_owner(ctx.author.id))
+    return (acl.is_owner(ctx.author.id),
+            ctx.channel.permissions_for(ctx.author).value,
+            ctx.channel.is_nsfw())
+
+
+def _target(command_or_bot):
+    if isinstance(command_or_bot, Command):
+        return ('command', command_or_bot.qualified_name)
+    if isinstance(command_or_bot, commands.Bot):
+        return ('bot',)
+    return ('cog', type(command_or_bot).__name__)
+
 
 class Paginator:
     """A class that aids in paginating embeds for Discord messages.
@@ -236,14 +267,10 @@ class EmbedHelp(HelpFormatter):
         if self.show_check_failure:
             return filter(sane_no_suspension_point_predicate, iterator)
 
-        # Gotta run every check and verify it
-        ret = []
-        for elem in iterator:
-            valid = await predicate(elem)
-            if valid:
-                ret.append(elem)
-
-        return ret
+        # Gotta run every check and verify it, all at once since most of them are cheap
+        candidates = [elem for elem in iterator if sane_no_suspension_point_predicate(elem)]
+        results = await asyncio.gather(*(predicate(elem) for elem in candidates))
+        return [elem for elem, valid in zip(candidates, results) if valid]
 
     def _add_subcommands_to_page(self, max_width, commands):
         for name, command in commands:
@@ -269,10 +296,20 @@ class EmbedHelp(HelpFormatter):
         --------
         list
             A paginated output of the help command.
+
+        Pages are cached by prefix, permission signature and target. Callers
+        get their own copies of the embeds, so setting the colour is fine.
         """
-        self.context = context
-        self.command = command_or_bot
-        return (await self.format())
+        key = (context.prefix, context.invoked_with, permission_signature(context), _target(command_or_bot))
+        cached = pages.get(key)
+        if cached is None:
+            # a copy per call, concurrent help commands would trample each other's context otherwise
+            formatter = copy.copy(self)
+            formatter.context = context
+            formatter.command = command_or_bot
+            cached = await formatter.format()
+            pages.set(key, cached)
+        return [copy.copy(embed) for embed in cached]
 
     async def format(self):
         """Handles the actual behaviour involved with formatting.
@@ -24,8 +24,15 @@ DEALINGS IN THE SOFTWARE.
 
 import re
 import heapq
+from collections import Counter
 from difflib import SequenceMatcher
 
+try:
+    import numpy as np
+except ImportError:
+    # score_many falls back to plain Python
+    np = None
+
 def ratio(a, b):
     m = SequenceMatcher(None, a, b)
     return int(round(100 * m.ratio()))
@@ -74,6 +81,125 @@ def partial_token_sort_ratio(a, b):
     b = _sort_tokens(b)
     return partial_ratio(a, b)
 
+# Bit-parallel scorers, the whole column of the DP table lives in one (big) int
+# so each character of b costs a handful of int ops instead of a row of work.
+# They give the same 0-100 scale as the difflib ones, pick them with
+# algorithm='levenshtein' or algorithm='lcs' in the extract functions.
+
+def _pattern(a):
+    peq = {}
+    bit = 1
+    for ch in a:
+        peq[ch] = peq.get(ch, 0) | bit
+        bit <<= 1
+    return peq
+
+def _levenshtein(peq, m, b):
+    # Myers/Hyyrö, a is the pattern behind peq and m its length
+    if not m:
+        return len(b)
+    mask = (1 << m) - 1
+    high = 1 << (m - 1)
+    vp, vn, dist = mask, 0, m
+    for ch in b:
+        eq = peq.get(ch, 0)
+        x = eq | vn
+        d0 = (((x & vp) + vp) ^ vp) | x
+        hp = vn | ~(d0 | vp)
+        hn = vp & d0
+        if hp & high:
+            dist += 1
+        elif hn & high:
+            dist -= 1
+        x = ((hp << 1) | 1) & mask
+        vn = x & d0
+        vp = ((hn << 1) | ~(x | d0)) & mask
+    return dist
+
+def _lcs(peq, m, b):
+    # Hyyrö's bit-parallel longest common subsequence
+    mask = (1 << m) - 1
+    v = mask
+    for ch in b:
+        u = v & peq.get(ch, 0)
+        v = ((v + u) | (v - u)) & mask
+    return m - bin(v).count('1')
+
+def levenshtein(a, b):
+    return _levenshtein(_pattern(a), len(a), b)
+
+def lev_ratio(a, b):
+    longest = max(len(a), len(b))
+    if not longest:
+        return 100
+    return int(round(100 * (1 - levenshtein(a, b) / longest)))
+
+def lcs_ratio(a, b):
+    # 2 * LCS / total, the same formula SequenceMatcher.ratio uses
+    total = len(a) + len(b)
+    if not total:
+        return 100
+    return int(round(100 * 2.0 * _lcs(_pattern(a), len(a), b) / total))
+
+def _partial(a, b, score):
+    short, long = (a, b) if len(a) <= len(b) else (b, a)
+    m = len(short)
+    if not m:
+        return 100
+    peq = _pattern(short)
+    best = 0
+    for start in range(len(long) - m + 1):
+        r = score(peq, m, long[start:start + m])
+        if r >= m:
+            return 100
+        best = max(best, r)
+    return int(round(100 * best / m))
+
+def partial_lev_ratio(a, b):
+    # best window of the longer string, same idea as partial_ratio
+    return _partial(a, b, lambda peq, m, w: m - _levenshtein(peq, m, w))
+
+def partial_lcs_ratio(a, b):
+    return _partial(a, b, _lcs)
+
+def token_sort_lev_ratio(a, b):
+    return lev_ratio(_sort_tokens(a), _sort_tokens(b))
+
+def token_sort_lcs_ratio(a, b):
+    return lcs_ratio(_sort_tokens(a), _sort_tokens(b))
+
+def partial_token_sort_lev_ratio(a, b):
+    return partial_lev_ratio(_sort_tokens(a), _sort_tokens(b))
+
+def partial_token_sort_lcs_ratio(a, b):
+    return partial_lcs_ratio(_sort_tokens(a), _sort_tokens(b))
+
+# algorithm -> difflib scorer -> its replacement
+ALGORITHMS = {
+    'difflib': {},
+    'levenshtein': {
+        ratio: lev_ratio,
+        quick_ratio: lev_ratio,
+        partial_ratio: partial_lev_ratio,
+        token_sort_ratio: token_sort_lev_ratio,
+        quick_token_sort_ratio: token_sort_lev_ratio,
+        partial_token_sort_ratio: partial_token_sort_lev_ratio,
+    },
+    'lcs': {
+        ratio: lcs_ratio,
+        quick_ratio: lcs_ratio,
+        partial_ratio: partial_lcs_ratio,
+        token_sort_ratio: token_sort_lcs_ratio,
+        quick_token_sort_ratio: token_sort_lcs_ratio,
+        partial_token_sort_ratio: partial_token_sort_lcs_ratio,
+    },
+}
+
+def _pick(scorer, algorithm):
+    if algorithm is None:
+        return scorer
+    return ALGORITHMS[algorithm].get(scorer, scorer)
+
 def _extraction_generator(query, choices, scorer=quick_ratio, score_cutoff=0):
     try:
         for key, value in choices.items():
@@ -86,15 +212,15 @@ def _extraction_generator(query, choices, scorer=quick_ratio, score_cutoff=0):
             if score >= score_cutoff:
                 yield (choice, score)
 
-def extract(query, choices, *, scorer=quick_ratio, score_cutoff=0, limit=10):
-    it = _extraction_generator(query, choices, scorer, score_cutoff)
+def extract(query, choices, *, scorer=quick_ratio, score_cutoff=0, limit=10, algorithm=None):
+    it = _extraction_generator(query, choices, _pick(scorer, algorithm), score_cutoff)
     key = lambda t: t[1]
     if limit is not None:
         return heapq.nlargest(limit, it, key=key)
     return sorted(it, key=key, reverse=True)
 
-def extract_one(query, choices, *, scorer=quick_ratio, score_cutoff=0):
-    it = _extraction_generator(query, choices, scorer, score_cutoff)
+def extract_one(query, choices, *, scorer=quick_ratio, score_cutoff=0, algorithm=None):
+    it = _extraction_generator(query, choices, _pick(scorer, algorithm), score_cutoff)
     key = lambda t: t[1]
     try:
         return max(it, key=key)
@@ -102,8 +228,11 @@ def extract_one(query, choices, *, scorer=quick_ratio, score_cutoff=0):
         # iterator could return nothing
         return None
 
-def extract_or_exact(query, choices, *, limit=None, scorer=quick_ratio, score_cutoff=0):
-    matches = extract(query, choices, scorer=scorer, score_cutoff=score_cutoff, limit=limit)
+def extract_or_exact(query, choices, *, limit=None, scorer=quick_ratio, score_cutoff=0, algorithm=None):
+    matches = extract(query, choices, scorer=scorer, score_cutoff=score_cutoff, limit=limit, algorithm=algorithm)
+    return _exact_or_all(matches)
+
+def _exact_or_all(matches):
     if len(matches) == 0:
         return []
 
@@ -119,8 +248,8 @@ def extract_or_exact(query, choices, *, limit=None, scorer=quick_ratio, score_cu
 
     return matches
 
-def extract_matches(query, choices, *, scorer=quick_ratio, score_cutoff=0):
-    matches = extract(query, choices, scorer=scorer, score_cutoff=score_cutoff, limit=None)
+def extract_matches(query, choices, *, scorer=quick_ratio, score_cutoff=0, algorithm=None):
+    matches = extract(query, choices, scorer=scorer, score_cutoff=score_cutoff, limit=None, algorithm=algorithm)
     if len(matches) == 0:
         return []
 
@@ -140,3 +269,249 @@ def extract_matches(query, choices, *, scorer=quick_ratio, score_cutoff=0):
 
         to_return.append(match)
     return to_return
+
+def _trigrams(s):
+    s = f' {s} '
+    return {s[i:i + 3] for i in range(len(s) - 2)}
+
+def _count_ratio(a_len, a_counts, b_len, b_counts):
+    # what SequenceMatcher.quick_ratio works out, from prebuilt counts
+    total = a_len + b_len
+    if not total:
+        return 100
+    matches = 0
+    for ch, n in a_counts.items():
+        m = b_counts.get(ch)
+        if m:
+            matches += n if n < m else m
+    return int(round(100 * 2.0 * matches / total))
+
+def _length_ratio(a_len, b_len):
+    # what SequenceMatcher.real_quick_ratio works out
+    total = a_len + b_len
+    if not total:
+        return 100
+    return int(round(100 * 2.0 * min(a_len, b_len) / total))
+
+# scorer -> (preprocess, score on preprocessed strings, has an upper bound)
+# quick_ratio >= ratio and real_quick_ratio >= quick_ratio, so both bounds are safe to prune with.
+# They hold for lcs (LCS <= shared characters) and levenshtein (edits >= longest - shared) too.
+_SCORERS = {
+    lev_ratio: (None, lev_ratio, 'count'),
+    lcs_ratio: (None, lcs_ratio, 'count'),
+    token_sort_lev_ratio: (_sort_tokens, lev_ratio, 'count'),
+    token_sort_lcs_ratio: (_sort_tokens, lcs_ratio, 'count'),
+    partial_lev_ratio: (None, partial_lev_ratio, None),
+    partial_lcs_ratio: (None, partial_lcs_ratio, None),
+    ratio: (None, ratio, 'count'),
+    quick_ratio: (None, None, 'length'),
+    token_sort_ratio: (_sort_tokens, ratio, 'count'),
+    quick_token_sort_ratio: (_sort_tokens, None, 'length'),
+    partial_ratio: (None, partial_ratio, None),
+    partial_token_sort_ratio: (_sort_tokens, partial_ratio, None),
+}
+
+if np is not None:
+    _BYTE_BITS = np.array([bin(i).count('1') for i in range(256)], dtype=np.uint8)
+
+def _popcount(v):
+    return _BYTE_BITS[v.view(np.uint8)].reshape(-1, 8).sum(axis=1, dtype=np.int64)
+
+def _lcs_many(peq, m, columns):
+    # _lcs for every choice at once, one uint64 lane per choice, looping over character positions only
+    mask = np.uint64((1 << m) - 1)
+    v = np.full(columns.shape[1], mask, dtype=np.uint64)
+    for column in columns:
+        u = v & peq[column]
+        v = ((v + u) | (v - u)) & mask
+    return m - _popcount(v)
+
+class _Prepared:
+    def __init__(self, keys, process):
+        self.strings = [process(k) for k in keys] if process else list(keys)
+        self.lengths = [len(s) for s in self.strings]
+        self.counts = [Counter(s) for s in self.strings]
+        self.grams = {}
+        for i, s in enumerate(self.strings):
+            for gram in _trigrams(s):
+                self.grams.setdefault(gram, []).append(i)
+        self._encoded = None
+
+    def encoded(self):
+        '''Character codes as a (longest string x choices) array, 0 is padding.'''
+        if self._encoded is None:
+            alphabet = {}
+            for s in self.strings:
+                for ch in s:
+                    if ch not in alphabet:
+                        alphabet[ch] = len(alphabet) + 1
+            longest = max(self.lengths, default=0)
+            columns = np.zeros((longest, len(self.strings)), dtype=np.int32)
+            for i, s in enumerate(self.strings):
+                columns[:len(s), i] = [alphabet[ch] for ch in s]
+            self._encoded = (alphabet, columns, np.array(self.lengths, dtype=np.int64))
+        return self._encoded
+
+class FuzzyIndex:
+    """Fuzzy matching over a fixed set of choices, built once and queried many times.
+
+    Choices are preprocessed (tokenized and sorted for the token_sort scorers)
+    once and indexed by trigram. A query scores the choices sharing the most
+    trigrams with it first, that gives a score to beat, and every other choice
+    is only scored if a cheap upper bound (length, then character counts) says
+    it could still beat it. The results are the same as the module level
+    functions would give for the same choices.
+    """
+
+    def __init__(self, choices, *, candidates=32):
+        self.candidates = candidates
+        try:
+            self.keys = list(choices.keys())
+            self.values = [choices[k] for k in self.keys]
+        except AttributeError:
+            self.keys = list(choices)
+            self.values = None
+        self._prepared = {}
+
+    def __len__(self):
+        return len(self.keys)
+
+    def _prepare(self, process):
+        prep = self._prepared.get(process)
+        if prep is None:
+            prep = self._prepared[process] = _Prepared(self.keys, process)
+        return prep
+
+    def prepare(self, scorer=quick_ratio, algorithm=None):
+        '''Does the preprocessing for a scorer now instead of on the first query.'''
+        self._prepare(_SCORERS.get(_pick(scorer, algorithm), (None,))[0])
+
+    def _ranked_candidates(self, prep, query):
+        shared = Counter()
+        for gram in _trigrams(query):
+            shared.update(prep.grams.get(gram, ()))
+        return [i for i, _ in shared.most_common(self.candidates)]
+
+    def _search(self, query, scorer, score_cutoff, limit):
+        if scorer not in _SCORERS:
+            # nothing known about it, so score everything like extract does
+            found = [(scorer(query, k), i) for i, k in enumerate(self.keys)]
+            return [t for t in found if t[0] >= score_cutoff]
+
+        process, score, bound = _SCORERS[scorer]
+        prep = self._prepare(process)
+        q = process(query) if process else query
+        q_len, q_counts = len(q), Counter(q)
+        strings, lengths, counts = prep.strings, prep.lengths, prep.counts
+
+        # min heap of (score, -index), so the root is the worst result kept
+        heap, found = [], []
+
+        def consider(i):
+            if score is None:
+                s = _count_ratio(q_len, q_counts, lengths[i], counts[i])
+            else:
+                s = score(q, strings[i])
+            if s < score_cutoff:
+                return
+            if limit is None:
+                found.append((s, i))
+            elif len(heap) < limit:
+                heapq.heappush(heap, (s, -i))
+            elif (s, -i) > heap[0]:
+                heapq.heapreplace(heap, (s, -i))
+
+        seen = set()
+        if bound is not None and limit is not None:
+            seen.update(self._ranked_candidates(prep, q))
+            for i in sorted(seen):
+                consider(i)
+
+        for i in range(len(strings)):
+            if i in seen:
+                continue
+            if bound is not None:
+                floor = heap[0][0] if limit is not None and len(heap) == limit else score_cutoff
+                if _length_ratio(q_len, lengths[i]) < floor:
+                    continue
+                if bound == 'count' and _count_ratio(q_len, q_counts, lengths[i], counts[i]) < floor:
+                    continue
+            consider(i)
+
+        if limit is not None:
+            found = [(s, -i) for s, i in heap]
+        return found
+
+    def extract(self, query, *, scorer=quick_ratio, score_cutoff=0, limit=10, algorithm=None):
+        found = self._search(query, _pick(scorer, algorithm), score_cutoff, limit)
+        found.sort(key=lambda t: (-t[0], t[1]))
+        if limit is not None:
+            found = found[:limit]
+        if self.values is None:
+            return [(self.keys[i], s) for s, i in found]
+        return [(self.keys[i], s, self.values[i]) for s, i in found]
+
+    def _score_all(self, prep, q):
+        m = len(q)
+        if np is not None and 0 < m <= 64:
+            alphabet, columns, lengths = prep.encoded()
+            peq = np.zeros(len(alphabet) + 1, dtype=np.uint64)
+            for i, ch in enumerate(q):
+                code = alphabet.get(ch)
+                if code:
+                    peq[code] |= np.uint64(1 << i)
+            total = lengths + m
+            return np.rint(200 * _lcs_many(peq, m, columns) / total).astype(np.int64)
+
+        # no numpy (or a query too long for one lane), same numbers the slow way
+        peq = _pattern(q)
+        scores = []
+        for s, length in zip(prep.strings, prep.lengths):
+            total = m + length
+            scores.append(int(round(100 * 2.0 * _lcs(peq, m, s) / total)) if total else 100)
+        return scores
+
+    def _top(self, scores, limit, score_cutoff):
+        if np is None or not isinstance(scores, np.ndarray):
+            found = ((s, i) for i, s in enumerate(scores) if s >= score_cutoff)
+            if limit is None:
+                return sorted(found, key=lambda t: (-t[0], t[1]))
+            return heapq.nlargest(limit, found, key=lambda t: (t[0], -t[1]))
+
+        picked = np.flatnonzero(scores >= score_cutoff)
+        if limit is not None and len(picked) > limit:
+            # everything above the k-th score plus the earliest ties, like a stable sort would keep
+            kth = np.partition(scores[picked], len(picked) - limit)[len(picked) - limit]
+            above = picked[scores[picked] > kth]
+            ties = picked[scores[picked] == kth][:limit - len(above)]
+            picked = np.concatenate((above, ties))
+        order = np.lexsort((picked, -scores[picked]))
+        return [(int(scores[i]), int(i)) for i in picked[order]]
+
+    def score_many(self, query, *, token_sort=False, limit=10, score_cutoff=0):
+        '''Scores the query against every choice in one go.
+
+        Uses lcs_ratio (token_sort_lcs_ratio with token_sort), vectorized
+        with numpy when it's installed. Returns the score of every choice, in
+        choice order (a numpy array if numpy is there, else a list), and the
+        top matches in the same shape extract gives.
+        '''
+        process = _sort_tokens if token_sort else None
+        prep = self._prepare(process)
+        scores = self._score_all(prep, process(query) if process else query)
+        found = self._top(scores, limit, score_cutoff)
+        if self.values is None:
+            return scores, [(self.keys[i], s) for s, i in found]
+        return scores, [(self.keys[i], s, self.values[i]) for s, i in found]
+
+    def extract_one(self, query, *, scorer=quick_ratio, score_cutoff=0, algorithm=None):
+        matches = self.extract(query, scorer=scorer, score_cutoff=score_cutoff, limit=1, algorithm=algorithm)
+        return matches[0] if matches else None
+
+    def extract_or_exact(self, query, *, limit=None, scorer=quick_ratio, score_cutoff=0, algorithm=None):
+        matches = self.extract(query, scorer=scorer, score_cutoff=score_cutoff, limit=limit, algorithm=algorithm)
+        return _exact_or_all(matches)
+
+def score_many(query, choices, *, token_sort=False, limit=10, score_cutoff=0):
+    """One off FuzzyIndex.score_many, keep an index around if the choices get reused."""
+    return FuzzyIndex(choices).score_many(query, token_sort=token_sort, limit=limit, score_cutoff=score_cutoff)
@@ -0,0 +1,329 @@
+'''Google search scraping, parsed off the event loop.
+
+Every path used on a result page is compiled once here, parsing runs on a
+dedicated thread and parsed results are cached (and coalesced) per query.
+'''
+
+import asyncio
+import discord
+
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import quote as uriquote
+from lxml import etree
+
+from util import cache, http, metrics
+
+
+_executor = ThreadPoolExecutor(max_workers=1)
+
+X = etree.XPath
+
+CARD = X(".//div[@id='rso']/div[@class='_NId']//"
+         "div[contains(@class, 'vk_c') or @class='g mnr-c g-blk' or @class='kp-blk']")
+RESULTS = X(".//div[@class='rc']")
+RESULT_LINK = X("./h3[@class='r']/a")
+
+CALCULATOR = X(".//span[@class='cwclet']")
+CALCULATOR_RESULT = X(".//span[@class='cwcot']")
+
+UNIT_INPUTS = X(".//input[contains(@class, '_eif') and @value]")
+UNIT_SELECTED = X("parent::div/select/option[@selected='1']/text()")
+
+CURRENCY_SELECTORS = X(".//div[@class='ccw_unit_selector_cnt']")
+CURRENCY_SELECTED = X("./select/option[@selected='1']")
+CURRENCY_VALUE = X("parent::td/parent::tr/td/input[@class='vk_gy vk_sh ccw_data']")
+
+INFO = X(".//div[@class='_f2g']")
+INFO_ANSWER = X("parent::div/parent::div//div[@class='_XWk' or contains(@class, 'kpd-ans')]")
+
+TRANSLATION = X(".//div[@id='tw-ob']")
+TRANSLATION_SOURCE = X(".//pre[@id='tw-source-text']/span")
+TRANSLATION_SOURCE_LANG = X(".//select[@id='tw-sl']/option[@selected='1']")
+TRANSLATION_TARGET = X(".//pre[@id='tw-target-text']/span")
+TRANSLATION_TARGET_LANG = X(".//select[@id='tw-tl']/option[@selected='1']")
+
+TIME = X("./div[@class='vk_bk vk_ans']")
+TIME_DATE = X("./div[@class='vk_gy vk_sh']")
+TIME_TITLE = X("span")
+TIME_CONVERSION = X("./div/div[@class='vk_bk vk_ans _nEd']")
+
+WORDS = X(".//span[@data-dobid='hdw']")
+PRONUNCIATION = X(".//span[@class='lr_dct_ph']/span")
+LEXICAL = X(".//div[@class='lr_dct_sf_h']/i/span")
+DEFINITIONS = X("../../../ol[@class='lr_dct_sf_sens']//"
+                "div[not(@class and @class='lr_dct_sf_subsen')]/"
+                "div[@class='_Jig']/div[@data-dobid='dfn']/span")
+
+WEATHER_LOCATION = X("./div[@id='wob_loc']")
+WEATHER_DATE = X("./div[@id='wob_dts']")
+WEATHER_CATEGORY = X(".//img[@id='wob_tci']")
+WEATHER_TEMPERATURES = X(".//div[@id='wob_d']//div[contains(@class, 'vk_bk')]//span[@class='wob_t']")
+WEATHER_MISC = X(".//div[@class='vk_gy vk_sh wob-dtl']")
+WEATHER_PRECIPITATION = X("./div/span[@id='wob_pp']")
+WEATHER_HUMIDITY = X("./div/span[@id='wob_hm']")
+WEATHER_WIND = X("./div/span/span[@id='wob_tws']")
+
+
+def first(xpath, node):
+    '''Like node.find, the first match or None.'''
+    found = xpath(node)
+    return found[0] if found else None
+
+
+def parse_card(node):
+    e = discord.Embed(colour=discord.Colour.blurple())
+
+    # check if it's a calculator card:
+    calculator = first(CALCULATOR, node)
+    if calculator is not None:
+        e.title = 'Calculator'
+        result = first(CALCULATOR_RESULT, node)
+        if result is not None:
+            result = ' '.join((calculator.text, result.text.strip()))
+        else:
+            result = calculator.text + ' ???'
+        e.description = result
+        return e
+
+    # check for unit conversion card
+    unit_conversions = UNIT_INPUTS(node)
+    if len(unit_conversions) == 2:
+        e.title = 'Unit Conversion'
+
+        # the <input> contains our values, first value = second value essentially.
+        # these <input> also have siblings with <select> and <option selected=1>
+        # that denote what units we're using
+
+        # We will get 2 <option selected="1"> nodes by traversing the parent
+        # The first unit being converted (e.g. Miles)
+        # The second unit being converted (e.g. Feet)
+        try:
+            first_node = unit_conversions[0]
+            first_unit = UNIT_SELECTED(first_node)[0]
+            first_value = float(first_node.get('value'))
+            second_node = unit_conversions[1]
+            second_unit = UNIT_SELECTED(second_node)[0]
+            second_value = float(second_node.get('value'))
+            e.description = ' '.join(
+                (str(first_value), first_unit, '=', str(second_value), second_unit))
+        except Exception:
+            return None
+        else:
+            return e
+
+    # check for currency conversion card
+    if 'currency' in node.get('class', ''):
+        currency_selectors = CURRENCY_SELECTORS(node)
+        if len(currency_selectors) == 2:
+            e.title = 'Currency Conversion'
+            # Inside this <div> is a <select> with <option selected="1"> nodes
+            # just like the unit conversion card.
+
+            first_node = currency_selectors[0]
+            first_currency = first(CURRENCY_SELECTED, first_node)
+
+            second_node = currency_selectors[1]
+            second_currency = first(CURRENCY_SELECTED, second_node)
+
+            # The parent of the nodes have a <input class='vk_gy vk_sh ccw_data' value=...>
+            try:
+                first_value = float(CURRENCY_VALUE(first_node)[0].get('value'))
+                second_value = float(CURRENCY_VALUE(second_node)[0].get('value'))
+
+                values = (
+                    str(first_value),
+                    first_currency.text,
+                    f'({first_currency.get("value")})',
+                    '=',
+                    str(second_value),
+                    second_currency.text,
+                    f'({second_currency.get("value")})'
+                )
+                e.description = ' '.join(values)
+            except Exception:
+                return None
+            else:
+                return e
+
+    # check for generic information card
+    info = first(INFO, node)
+    if info is not None:
+        try:
+            e.title = ''.join(info.itertext()).strip()
+            actual_information = INFO_ANSWER(info)[0]
+            e.description = ''.join(actual_information.itertext()).strip()
+        except Exception:
+            return None
+        else:
+            return e
+
+    # check for translation card
+    translation = first(TRANSLATION, node)
+    if translation is not None:
+        src_text = first(TRANSLATION_SOURCE, translation)
+        src_lang = first(TRANSLATION_SOURCE_LANG, translation)
+
+        dest_text = first(TRANSLATION_TARGET, translation)
+        dest_lang = first(TRANSLATION_TARGET_LANG, translation)
+
+        # TODO: bilingual dictionary nonsense?
+
+        e.title = 'Translation'
+        try:
+            e.add_field(name=src_lang.text, value=src_text.text, inline=True)
+            e.add_field(name=dest_lang.text, value=dest_text.text, inline=True)
+        except Exception:
+            return None
+        else:
+            return e
+
+    # check for "time in" card
+    time = first(TIME, node)
+    if time is not None:
+        date = first(TIME_DATE, node)
+        try:
+            e.title = first(TIME_TITLE, node).text
+            e.description = f'{time.text}\n{"".join(date.itertext()).strip()}'
+        except Exception:
+            return None
+        else:
+            return e
+
+    # time in has an alternative form without spans
+    time = first(TIME_CONVERSION, node)
+    if time is not None:
+        converted = "".join(time.itertext()).strip()
+        try:
+            # remove the in-between text
+            parent = time.getparent()
+            parent.remove(time)
+            original = "".join(parent.itertext()).strip()
+            e.title = 'Time Conversion'
+            e.description = f'{original}...\n{converted}'
+        except Exception:
+            return None
+        else:
+            return e
+
+    # check for definition card
+    words = WORDS(node)
+    if words:
+        for word in words:
+            # we must go two parents up to get the root node
+            root = word.getparent().getparent()
+
+            pronunciation = first(PRONUNCIATION, root)
+            if pronunciation is None:
+                continue
+
+            # the definitions are found based on the position from lex
+            for category in LEXICAL(root):
+                definitions = DEFINITIONS(category)
+                try:
+                    descrip = [f'*{category.text}*']
+                    for index, value in enumerate(definitions, 1):
+                        descrip.append(f'{index}. {value.text}')
+
+                    e.add_field(name=f'{word.text} /{pronunciation.text}/',
+                                value='\n'.join(descrip))
+                except:
+                    continue
+
+        return e
+
+    # check for weather card
+    location = first(WEATHER_LOCATION, node)
+    if location is None:
+        return None
+
+    # these units should be metric
+
+    date = first(WEATHER_DATE, node)
+
+    # <img alt="category here" src="cool image">
+    category = first(WEATHER_CATEGORY, node)
+
+    temperatures = WEATHER_TEMPERATURES(node)
+
+    misc_info_node = first(WEATHER_MISC, node)
+
+    if misc_info_node is None:
+        return None
+
+    precipitation = first(WEATHER_PRECIPITATION, misc_info_node)
+    humidity = first(WEATHER_HUMIDITY, misc_info_node)
+    wind = first(WEATHER_WIND, misc_info_node)
+
+    try:
+        e.title = 'Weather for ' + location.text.strip()
+        e.description = f'*{category.get("alt")}*'
+        e.set_thumbnail(url='https:' + category.get('src'))
+
+        if len(temperatures) == 4:
+            first_unit = temperatures[0].text + temperatures[2].text
+            second_unit = temperatures[1].text + temperatures[3].text
+            units = f'{first_unit} | {second_unit}'
+        else:
+            units = 'Unknown'
+
+        e.add_field(name='Temperature', value=units, inline=False)
+
+        if precipitation is not None:
+            e.add_field(name='Precipitation', value=precipitation.text)
+
+        if humidity is not None:
+            e.add_field(name='Humidity', value=humidity.text)
+
+        if wind is not None:
+            e.add_field(name='Wind', value=wind.text)
+    except:
+        return None
+
+    return e
+
+
+def parse_page(text):
+    '''Returns (card embed or None, [(url, title)]) for a result page, blocking.'''
+    with metrics.histogram('google.parse').time():
+        root = etree.fromstring(text, etree.HTMLParser())
+
+        """
+        Tree looks like this.. sort of..
+        <div class="rc">
+            <h3 class="r">
+                <a href="url here">title here</a>
+            </h3>
+        </div>
+        """
+
+        card_node = CARD(root)
+        card = parse_card(card_node[0]) if card_node else None
+
+        # list of URLs and title tuples
+        entries = []
+        for node in RESULTS(root):
+            link = first(RESULT_LINK, node)
+            if link is not None:
+                entries.append((link.get('href'), link.text))
+
+        return card, entries
+
+
+@cache.async_cache(maxsize=128, ttl=600)
+async def search(query):
+    '''Searches google, the card is shared with other callers so copy it before changing it.'''
+    url = f'https://www.google.com/search?q={uriquote(query)}'
+    params = {
+        'safe': 'on',
+        'lr': 'lang_en',
+        'hl': 'en'
+    }
+
+    headers = {
+        'User-Agent': 'Mozilla/5.0 (Windows NT 6.3; Win64; x64) Gecko/20100101 Firefox/53.0'
+    }
+
+    # the page goes through the http caches too so the disk tier keeps it across restarts,
+    # google sends max-age=0 so ttl says how long it's good for
+    text = await http.get(url, params=params, headers=headers, raise_for_status=True, ttl=600)
+    return await asyncio.get_event_loop().run_in_executor(_executor, parse_page, text)
@@ -9,15 +9,22 @@ except ImportError:
           "and do ALL the steps in order.\n")
     sys.exit(1)
 from ext.context import CustomContext
-from ext.formatter import EmbedHelp
+from ext.formatter import EmbedHelp, invalidate as invalidate_help
 from collections import defaultdict
 from ext import embedtobox
-from util import repo, default
-from PIL import Image
+from util import repo, default, http, dataIO, metrics
+from util.prefixes import PrefixResolver
+from util.acl import acl
+from util.cogloader import CogLoader
+from util.storage import Storage
+from util.usercount import UserCounter
+from util.presence import PresenceManager
+from util.polls import PollManager
+from util.roles import RoleIndexes
+from util.timings import CommandTimings
 import asyncio
 import aiohttp
 import datetime
-import psutil
 import time
 import json
 import os
@@ -25,7 +32,6 @@ import re
 import textwrap
 import io
 import logging
-from collections import Counter 
 from pathlib import Path
 
 
@@ -43,29 +49,67 @@ class LinuClient(AutoShardedBot):
         super().__init__(
             command_prefix=self.get_pre,
             fetch_offline_members=True)
+        self.storage = Storage('data/linu.db').open()
+        self.prefixes = PrefixResolver('data/config.json', self.storage)
+        self.acl = acl
+        self.acl.attach(self.storage)
+        # counters live in util/metrics now, TO UPDATE THEM linu evl metrics.counter('commands_ran').inc(80)
+        self._prefilter_rejected = metrics.counter('prefilter_rejected')
+        self._prefilter_passed = metrics.counter('prefilter_passed')
+        metrics.gauge('guilds', lambda: len(self.guilds))
+        metrics.gauge('users', lambda: len(self.usercount))
+        metrics.gauge('latency', lambda: self.latency * 1000)
         self.formatter = EmbedHelp()
-        self.process = psutil.Process()
-        self._extensions = [x.replace('.py', '') for x in os.listdir('cogs') if x.endswith('.py')]
+        # USER_COUNT=hll estimates the unique user count in a fixed 16KB instead of a dict entry per user
+        self.usercount = UserCounter(hyperloglog=os.environ.get('USER_COUNT', '').lower() == 'hll')
+        self.presence = PresenceManager(self)
+        # find_role's fuzzy indexes, dropped by the role events in cogs/events.py
+        self.role_indexes = RoleIndexes()
+        # polls live on the bot, a cog with reaction listeners could never be lazy
+        self.polls = PollManager(self, self.storage)
+        # commands slower than SLOW_COMMAND_MS end up in the slow log (linu slowest)
+        self.timings = CommandTimings(threshold=float(os.environ.get('SLOW_COMMAND_MS', 2000)))
+        self.before_invoke(self.timings.mark_callback)
+        if os.environ.get('HTTP_DISK_CACHE', '1') != '0':
+            http.client.enable_disk_cache('data/http_cache.db')
+        self._process = None
+        # LAZY_COGS=1 only loads a cog when one of its commands is first used
+        lazy = os.environ.get('LAZY_COGS', '').lower() in ('1', 'true', 'yes')
+        self.cogloader = CogLoader(self, 'cogs', lazy=lazy)
+        self._extensions = list(self.cogloader.manifest)
         self.last_message = None
         self.commands_used = defaultdict(int)
         self.remove_command('help')
         self.load_extensions()
+        print(self.cogloader.format_report())
         self.add_command(self.loacog)
         self.add_command(self.relcog)
         self.add_command(self.res)
-        self.session = aiohttp.ClientSession(loop=self.loop)
-        self.check = default.get("data/blacklist.json")
-        self.counter = Counter() # TO UPDATE COUNTERS linu evl bot.counter.update({'messages_read': 8000, 'commands_ran': 80})
+        self.loop.create_task(self.watch_files())
+        self.presence.start()
+        self.polls.start()
+        metrics.registry.start(self.loop)
 
-    def load_extensions(self, cogs=None, path='cogs.'):
+    @property
+    def session(self):
+        '''The aiohttp session shared by everything, see util/http.py'''
+        return http.client.session
+
+    @property
+    def process(self):
+        '''psutil handle for the bot, imported on first use'''
+        if self._process is None:
+            import psutil
+            self._process = psutil.Process()
+        return self._process
+
+    def load_extensions(self, cogs=None):
         '''Loads the default set of extensions or a seperate one if given'''
-        for extension in cogs or self._extensions:
-            try:
-                self.load_extension(f'{path}{extension}')
-                print(f'Loaded extension: {extension}')
-            except Exception as e:
-                print(f'LoadError: {extension}\n'
-                      f'{type(e).__name__}: {e}')
+        self.cogloader.start(cogs or self._extensions)
+
+    def load_extension(self, name):
+        super().load_extension(name)
+        self.cogloader.loaded(name)
 
 
     @property
@@ -80,14 +124,42 @@ class LinuClient(AutoShardedBot):
                 token = config.get('TOKEN').strip('\"')
         return os.environ.get('TOKEN') or token
 
+    def add_cog(self, cog):
+        super().add_cog(cog)
+        invalidate_help() # help pages list the commands
+
+    def remove_cog(self, name):
+        super().remove_cog(name)
+        invalidate_help()
+
     @staticmethod
     async def get_pre(bot, message):
-        '''Returns the prefix.'''
-        with open('data/config.json') as f:
-            prefix = json.load(f).get('PREFIX')
-        return os.environ.get('PREFIX') or prefix or f'<@{user_id}> '
+        '''Returns the prefixes, straight from memory.'''
+        if bot.prefixes.user_id is None and bot.user is not None:
+            bot.prefixes.set_user_id(bot.user.id)
+        return bot.prefixes.get(message.guild and message.guild.id)
+
+    async def watch_files(self):
+        '''Picks up hand edits to the config without a restart.'''
+        await self.wait_until_ready()
+        while not self.is_closed():
+            self.prefixes.maybe_reload()
+            self.acl.maybe_reload()
+            await asyncio.sleep(10)
+
+    async def close(self):
+        self.presence.stop()
+        self.polls.stop()
+        metrics.registry.stop()
+        await http.client.close()
+        await super().close()
+        dataIO.store.flush()
+        self.storage.close()
 
     def restart(self):
+        # execv replaces the process without running atexit or close(), so write everything out first
+        dataIO.store.flush()
+        self.storage.close()
         os.execv(sys.executable, ['python3'] + sys.argv)
 
     @staticmethod
@@ -128,6 +200,7 @@ class LinuClient(AutoShardedBot):
         '''Bot startup, sets uptime.'''
         if not hasattr(self, 'uptime'):
             self.uptime = datetime.datetime.utcnow()
+        self.prefixes.set_user_id(self.user.id)
         print(textwrap.dedent(f'''
         ---------------
         Client is ready!
@@ -141,13 +214,23 @@ class LinuClient(AutoShardedBot):
 
     async def process_commands(self, message):
         '''p r o c e s s   t h o s e     c o m m a n d s'''
-        blcheck = default.get("data/blacklist.json").blacklisted
-        if message.author.id in blcheck:
+        start = time.perf_counter()
+        if self.acl.is_blacklisted(message.author.id):
             return # oof get fucked
+        if not self.prefixes.matches(message.content, message.guild and message.guild.id):
+            self._prefilter_rejected.inc()
+            return # not a command, dont bother building a context
+        self._prefilter_passed.inc()
+        self.cogloader.ensure(message.content, self.prefixes.get(message.guild and message.guild.id))
         linu = await self.get_context(message, cls=CustomContext)
         if linu.command is None:
             return
-        await self.invoke(linu)
+        parsed = time.perf_counter()
+        linu.timings = {}
+        try:
+            await self.invoke(linu)
+        finally:
+            self.timings.record(linu, start, parsed)
 
     async def on_message(self, message):
         '''Responds only to users'''
@@ -155,6 +238,12 @@ class LinuClient(AutoShardedBot):
             return
         await self.process_commands(message)
 
+    async def on_raw_reaction_add(self, payload):
+        self.polls.on_reaction(payload, 1)
+
+    async def on_raw_reaction_remove(self, payload):
+        self.polls.on_reaction(payload, -1)
+
 
     @commands.command(aliases=["lo"])
     @commands.check(repo.is_owner)
@@ -177,7 +266,7 @@ class LinuClient(AutoShardedBot):
         try:
             await linu.send("Restarting...", delete_after=2)
             await asyncio.sleep(3)
-            os.execv(sys.executable, ['python3'] + sys.argv)
+            self.restart()
         except Exception as e:
             print(
                 f"Error in Restarting:\n{e}")
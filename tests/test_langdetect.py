@@ -0,0 +1,29 @@
+from util.langdetect import Detector
+
+
+detector = Detector.from_files()
+
+
+def test_short_latin_text_is_unsure():
+    assert detector.detect('I love pizza and pasta') is None
+    assert detector.detect('I want a banana') is None
+
+
+def test_hebrew_script_is_unsure():
+    # hebrew and yiddish are both written in it
+    assert detector.detect('שלום, מה שלומך היום?') is None
+    assert detector.detect('ווי גייט עס דיר הײַנט?') is None
+
+
+def test_greek_letters_in_latin_text():
+    assert detector.detect('The area of a circle is π times r squared') != 'el'
+
+
+def test_single_script_languages():
+    assert detector.detect('Καλημέρα, τι κάνεις;') == 'el'
+    assert detector.detect('こんにちは、元気ですか') == 'ja'
+
+
+def test_long_text():
+    assert detector.detect('The weather was really nice yesterday so we went for a long walk in the park.') == 'en'
+    assert detector.detect('Il faisait très beau hier alors nous sommes allés nous promener dans le parc.') == 'fr'
@@ -0,0 +1,110 @@
+import json
+import os
+
+from collections import namedtuple
+
+
+Snapshot = namedtuple('Snapshot', 'blacklist owners helpers admins')
+
+
+def _ids(values):
+    return frozenset(int(x) for x in values or ())
+
+
+class AccessControl:
+    '''Owners, helpers, admins and the blacklist, held as frozensets.
+
+    Everything is read from disk in reload() and swapped in as one snapshot,
+    so checks are a set lookup and never see a half loaded state. Once a
+    storage is attached the blacklist comes from there instead of the file.
+    '''
+
+    def __init__(self, config='conf.json', blacklist='data/blacklist.json'):
+        self.config = config
+        self.blacklist = blacklist
+        self.storage = None
+        self._mtimes = None
+        self._acl = Snapshot(frozenset(), frozenset(), frozenset(), frozenset())
+        self.reload()
+
+    @staticmethod
+    def _load(file):
+        try:
+            with open(file, encoding='utf8') as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return {}
+
+    def _stat(self):
+        mtimes = []
+        for file in (self.config, self.blacklist):
+            try:
+                mtimes.append(os.stat(file).st_mtime)
+            except FileNotFoundError:
+                mtimes.append(None)
+        return tuple(mtimes)
+
+    def attach(self, storage):
+        '''Moves the blacklist over to the storage.'''
+        self.storage = storage
+        self.reload()
+
+    def reload(self):
+        '''Reads everything again and swaps in a fresh snapshot.'''
+        mtimes = self._stat()
+        config = self._load(self.config)
+        if self.storage is not None:
+            blacklisted = self.storage.all('blacklist')
+        else:
+            blacklisted = self._load(self.blacklist).get('blacklisted')
+        self._acl = Snapshot(
+            blacklist=_ids(blacklisted),
+            owners=_ids(config.get('owners')),
+            helpers=_ids(config.get('helpers')),
+            admins=_ids(config.get('admins')))
+        self._mtimes = mtimes
+
+    def maybe_reload(self):
+        '''Reloads only if one of the files changed. Returns True if it did.'''
+        if self._stat() == self._mtimes:
+            return False
+        self.reload()
+        return True
+
+    @property
+    def snapshot(self):
+        return self._acl
+
+    def is_blacklisted(self, user_id):
+        return user_id in self._acl.blacklist
+
+    def is_owner(self, user_id):
+        return user_id in self._acl.owners
+
+    def is_helper(self, user_id):
+        return user_id in self._acl.helpers
+
+    def is_admin(self, user_id):
+        return user_id in self._acl.admins
+
+    def _save_blacklist(self, ids):
+        tmp = f'{self.blacklist}.tmp'
+        with open(tmp, 'w', encoding='utf8') as f:
+            json.dump({'blacklisted': sorted(ids)}, f, indent=2)
+        os.replace(tmp, self.blacklist)
+        self.reload()
+
+    async def blacklist_add(self, user_id):
+        if self.storage is None:
+            return self._save_blacklist(self._acl.blacklist | {user_id})
+        await self.storage.set('blacklist', user_id, True)
+        self.reload()
+
+    async def blacklist_remove(self, user_id):
+        if self.storage is None:
+            return self._save_blacklist(self._acl.blacklist - {user_id})
+        await self.storage.delete('blacklist', user_id)
+        self.reload()
+
+
+acl = AccessControl()
@@ -1,55 +1,217 @@
-from functools import wraps
+import asyncio
+import sys
+import time
 
+from collections import OrderedDict
+from functools import wraps
 
-def cache(maxsize=128):
-    cache = {}
 
+_MISSING = object()
+_KWD_MARK = (object(),)
+
+# every cache the decorators make, so the bot can show their stats
+caches = []
+
+
+def freeze(obj):
+    '''Turns dicts, lists and sets into hashable tuples (recursively).'''
+    if isinstance(obj, dict):
+        return (dict,) + tuple(sorted((k, freeze(v)) for k, v in obj.items()))
+    if isinstance(obj, (list, tuple)):
+        return (type(obj),) + tuple(freeze(x) for x in obj)
+    if isinstance(obj, set):
+        return frozenset(obj)
+    return obj
+
+
+def make_key(args, kwargs):
+    '''Builds a hashable tuple key, returns None if an argument isn't hashable.
+
+    Dicts, lists and sets (say params or headers) get frozen into tuples.
+    '''
+    key = args
+    if kwargs:
+        key += _KWD_MARK + tuple(sorted(kwargs.items()))
+    try:
+        hash(key)
+    except TypeError:
+        try:
+            key = freeze(key)
+            hash(key)
+        except TypeError:
+            return None
+    return key
+
+
+class LRUCache:
+    '''Least recently used cache with an optional time to live per entry.
+
+    Lookups, inserts and evictions are all O(1), the OrderedDict keeps the
+    recency order. Bounded by entry count and, if maxbytes is set, by the
+    (shallow) size of the stored values.
+    '''
+
+    def __init__(self, maxsize=128, ttl=None, maxbytes=None, name=None):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.maxbytes = maxbytes
+        self.name = name
+        self.currbytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+        self.coalesced = 0
+        self._data = OrderedDict()
+
+    def __len__(self):
+        return len(self._data)
+
+    def __contains__(self, key):
+        return self.get(key, _MISSING, count=False) is not _MISSING
+
+    def get(self, key, default=None, *, count=True):
+        try:
+            value, expires, size = self._data[key]
+        except KeyError:
+            if count:
+                self.misses += 1
+            return default
+        if expires is not None and expires <= time.monotonic():
+            self._remove(key)
+            self.expirations += 1
+            if count:
+                self.misses += 1
+            return default
+        self._data.move_to_end(key)
+        if count:
+            self.hits += 1
+        return value
+
+    def set(self, key, value, ttl=_MISSING):
+        '''Stores a value, ttl overrides the cache default for this entry.'''
+        if ttl is _MISSING:
+            ttl = self.ttl
+        expires = time.monotonic() + ttl if ttl else None
+        size = sys.getsizeof(value) if self.maxbytes else 0
+        if key in self._data:
+            self._remove(key)
+        self._data[key] = (value, expires, size)
+        self.currbytes += size
+        while self._data and (len(self._data) > self.maxsize or
+                              (self.maxbytes and self.currbytes > self.maxbytes)):
+            _, (_, _, dropped) = self._data.popitem(last=False)
+            self.currbytes -= dropped
+            self.evictions += 1
+
+    def _remove(self, key):
+        _, _, size = self._data.pop(key)
+        self.currbytes -= size
+
+    def pop(self, key, default=None):
+        if key not in self._data:
+            return default
+        value = self._data[key][0]
+        self._remove(key)
+        return value
+
+    def clear(self):
+        self._data.clear()
+        self.currbytes = 0
+
+    def stats(self):
+        total = self.hits + self.misses
+        return {
+            'name': self.name,
+            'size': len(self._data),
+            'maxsize': self.maxsize,
+            'bytes': self.currbytes,
+            'hits': self.hits,
+            'misses': self.misses,
+            'evictions': self.evictions,
+            'expirations': self.expirations,
+            'coalesced': self.coalesced,
+            'hit_rate': self.hits / total if total else 0.0,
+        }
+
+
+def _register(func, maxsize, ttl, maxbytes):
+    store = LRUCache(maxsize, ttl=ttl, maxbytes=maxbytes, name=f'{func.__module__}.{func.__qualname__}')
+    caches.append(store)
+    return store
+
+
+def cache(maxsize=128, ttl=None, maxbytes=None):
     def decorator(func):
+        store = _register(func, maxsize, ttl, maxbytes)
+
         @wraps(func)
         def inner(*args, no_cache=False, **kwargs):
-            if no_cache:
+            key = None if no_cache else make_key(args, kwargs)
+            if key is None:
                 return func(*args, **kwargs)
 
-            key_base = "_".join(str(x) for x in args)
-            key_end = "_".join(f"{k}:{v}" for k, v in kwargs.items())
-            key = f"{key_base}-{key_end}"
-
-            if key in cache:
-                return cache[key]
+            res = store.get(key, _MISSING)
+            if res is not _MISSING:
+                return res
 
             res = func(*args, **kwargs)
-
-            if len(cache) > maxsize:
-                del cache[list(cache.keys())[0]]
-                cache[key] = res
-
+            store.set(key, res)
             return res
+
+        inner.cache = store
         return inner
     return decorator
 
 
-def async_cache(maxsize=128):
-    cache = {}
+def async_cache(maxsize=128, ttl=None, maxbytes=None):
+    '''Like cache, but concurrent calls with the same key share one call.
 
+    The first caller starts the coroutine as a task, everyone else awaits
+    that same task, so they all get its result or its exception.
+    '''
     def decorator(func):
+        store = _register(func, maxsize, ttl, maxbytes)
+        inflight = {}
+
         @wraps(func)
         async def inner(*args, no_cache=False, **kwargs):
-            if no_cache:
+            key = None if no_cache else make_key(args, kwargs)
+            if key is None:
                 return await func(*args, **kwargs)
 
-            key_base = "_".join(str(x) for x in args)
-            key_end = "_".join(f"{k}:{v}" for k, v in kwargs.items())
-            key = f"{key_base}-{key_end}"
+            res = store.get(key, _MISSING)
+            if res is not _MISSING:
+                return res
 
-            if key in cache:
-                return cache[key]
+            task = inflight.get(key)
+            if task is None:
+                task = asyncio.ensure_future(func(*args, **kwargs))
+                inflight[key] = task
 
-            res = await func(*args, **kwargs)
+                def done(task):
+                    inflight.pop(key, None)
+                    if not task.cancelled() and task.exception() is None:
+                        store.set(key, task.result())
+                task.add_done_callback(done)
+            else:
+                store.coalesced += 1
 
-            if len(cache) > maxsize:
-                del cache[list(cache.keys())[0]]
-                cache[key] = res
+            # shielded so one caller giving up doesn't cancel it for the rest
+            return await asyncio.shield(task)
 
-            return res
+        inner.cache = store
+        inner.inflight = inflight
         return inner
     return decorator
+
+
+def format_stats():
+    '''One line per cache, for the bot to show.'''
+    lines = []
+    for store in caches:
+        s = store.stats()
+        lines.append(f"{s['name']}: {s['size']}/{s['maxsize']} entries, "
+                     f"{s['hits']} hits {s['misses']} misses ({s['hit_rate']:.0%}), "
+                     f"{s['evictions']} evicted {s['expirations']} expired {s['coalesced']} coalesced")
+    return '\n'.join(lines)
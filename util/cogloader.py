@@ -0,0 +1,198 @@
+import ast
+import importlib
+import json
+import os
+import sys
+import time
+
+
+def _str(node):
+    # ast.Str on 3.6/3.7, ast.Constant after that
+    value = getattr(node, 'value', getattr(node, 's', None))
+    return value if isinstance(value, str) else None
+
+
+def _decorator_info(node):
+    '''Returns (name, aliases) if the decorator registers a top level command.'''
+    if not isinstance(node, ast.Call) or not isinstance(node.func, ast.Attribute):
+        return None
+    func = node.func
+    # only commands.command / commands.group, subcommands hang off their group
+    if func.attr not in ('command', 'group') or not isinstance(func.value, ast.Name) or func.value.id != 'commands':
+        return None
+    name, aliases = None, []
+    for kw in node.keywords:
+        if kw.arg == 'name' and _str(kw.value):
+            name = _str(kw.value)
+        elif kw.arg == 'aliases' and isinstance(kw.value, (ast.List, ast.Tuple)):
+            aliases = [_str(x) for x in kw.value.elts if _str(x)]
+    return name, aliases
+
+
+def scan_cog(file):
+    '''Reads a cog file without importing it.
+
+    Returns the command names (with aliases) it registers, the modules it
+    imports at the top and if it has listeners, which means it can't wait
+    for its first command to be loaded.
+    '''
+    with open(file, encoding='utf8') as f:
+        tree = ast.parse(f.read(), file)
+
+    names, imports, listeners = [], [], False
+    for node in tree.body:
+        if isinstance(node, ast.Import):
+            imports.extend(alias.name for alias in node.names)
+        elif isinstance(node, ast.ImportFrom) and node.module and not node.level:
+            imports.append(node.module)
+        elif isinstance(node, ast.ClassDef):
+            for item in node.body:
+                if not isinstance(item, (ast.FunctionDef, ast.AsyncFunctionDef)):
+                    continue
+                if item.name.startswith('on_'):
+                    listeners = True
+                for deco in item.decorator_list:
+                    info = _decorator_info(deco)
+                    if info is not None:
+                        name, aliases = info
+                        names.append(name or item.name)
+                        names.extend(aliases)
+
+    return {
+        'commands': names,
+        'imports': list(dict.fromkeys(imports)),
+        'eager': listeners or not names,
+    }
+
+
+def build_manifest(path='cogs', cache='data/cog_manifest.json'):
+    '''Scans every cog, reusing the cached entry for files that didn't change.'''
+    try:
+        with open(cache, encoding='utf8') as f:
+            old = json.load(f)
+    except (FileNotFoundError, ValueError):
+        old = {}
+
+    manifest = {}
+    for file in sorted(os.listdir(path)):
+        if not file.endswith('.py'):
+            continue
+        full = os.path.join(path, file)
+        stat = os.stat(full)
+        stamp = [stat.st_mtime, stat.st_size]
+        entry = old.get(file[:-3])
+        if entry is None or entry.get('stamp') != stamp:
+            try:
+                entry = scan_cog(full)
+            except SyntaxError as e:
+                # let load_extension report it properly
+                entry = {'commands': [], 'imports': [], 'eager': True, 'error': str(e)}
+            entry['stamp'] = stamp
+        manifest[file[:-3]] = entry
+
+    if manifest != old:
+        try:
+            with open(cache, 'w', encoding='utf8') as f:
+                json.dump(manifest, f, indent=2)
+        except OSError:
+            pass
+    return manifest
+
+
+class CogLoader:
+    '''Loads cogs now or on their first command, timing each one.
+
+    In lazy mode only cogs with listeners are loaded up front, every other
+    command name from the manifest points at the cog that owns it and that
+    cog (with all its imports) gets loaded when someone first uses it.
+    '''
+
+    def __init__(self, bot, path='cogs', lazy=False):
+        self.bot = bot
+        self.path = path
+        self.lazy = lazy
+        self.manifest = build_manifest(path)
+        self.pending = {}
+        self.report = []
+
+    def start(self, extensions=None):
+        for name in extensions or self.manifest:
+            entry = self.manifest.get(name, {})
+            if self.lazy and not entry.get('eager', True):
+                for command in entry['commands']:
+                    self.pending[command] = name
+                print(f'Deferred extension: {name}')
+            else:
+                self.load(name)
+
+    def _time_imports(self, name):
+        timings = []
+        for module in self.manifest.get(name, {}).get('imports', ()):
+            if module in sys.modules:
+                continue
+            start = time.perf_counter()
+            try:
+                importlib.import_module(module)
+            except Exception:
+                # load_extension will raise the real error
+                continue
+            timings.append((module, (time.perf_counter() - start) * 1000))
+        return timings
+
+    def load(self, name):
+        '''Loads one cog and records how long it and each of its new imports took.'''
+        start = time.perf_counter()
+        imports = self._time_imports(name)
+        try:
+            self.bot.load_extension(f'{self.path}.{name}')
+        except Exception as e:
+            print(f'LoadError: {name}\n'
+                  f'{type(e).__name__}: {e}')
+            # don't retry it on every message
+            self.loaded(name)
+            return False
+        finally:
+            self.report.append({
+                'cog': name,
+                'ms': (time.perf_counter() - start) * 1000,
+                'imports': imports,
+            })
+        print(f'Loaded extension: {name}')
+        return True
+
+    def loaded(self, name):
+        '''Drops pending entries for a cog that got loaded some other way.'''
+        name = name.rpartition('.')[2]
+        for command in [k for k, v in self.pending.items() if v == name]:
+            del self.pending[command]
+
+    def ensure(self, content, prefixes):
+        '''Loads the cog behind the command in a message, if it's still pending.'''
+        if not self.pending:
+            return
+        for prefix in prefixes:
+            if content.startswith(prefix):
+                invoked = content[len(prefix):].split(None, 1)
+                if invoked and invoked[0] in self.pending:
+                    self.load(self.pending[invoked[0]])
+                return
+
+    def load_all(self):
+        '''Loads everything that is still pending, help needs the full list.'''
+        for name in list(dict.fromkeys(self.pending.values())):
+            self.load(name)
+
+    def format_report(self, imports=5):
+        '''Startup times per cog (slowest first) and the slowest imports.'''
+        lines = []
+        for entry in sorted(self.report, key=lambda e: e['ms'], reverse=True):
+            lines.append(f"{entry['cog']:<12} {entry['ms']:8.1f}ms")
+        slow = sorted((i for e in self.report for i in e['imports']), key=lambda i: i[1], reverse=True)
+        if slow:
+            lines.append('')
+            lines.append('Slowest imports:')
+            lines.extend(f'{module:<20} {ms:8.1f}ms' for module, ms in slow[:imports])
+        if self.pending:
+            lines.append('')
+            lines.append(f'Not loaded yet: {", ".join(sorted(set(self.pending.values())))}')
+        return '\n'.join(lines)
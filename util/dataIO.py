@@ -1,25 +1,108 @@
+import atexit
 import json
+import os
+import threading
 
 
-def change_value(file, value, changeto):
-    try:
-        with open(file, "r") as jsonFile:
-            data = json.load(jsonFile)
-    except FileNotFoundError:
-        raise FileNotFoundError("The file you tried to get does not exist...")
+def _write_atomic(file, text):
+    tmp = f"{file}.tmp"
+    with open(tmp, "w") as jsonFile:
+        jsonFile.write(text)
+        jsonFile.flush()
+        os.fsync(jsonFile.fileno())
+    os.replace(tmp, file)
+
+
+class WriteBehind:
+    """
+    Keeps the JSON files it touches in memory and writes changes back in batches.
+
+    A change marks the file dirty and starts a timer, everything that lands
+    before it fires goes out in one write per file (or sooner once max_pending
+    changes pile up). Writes go through a temp file and os.replace so a crash
+    never leaves half a file, and happen on the timer thread so the event loop
+    doesn't wait on the disk. Edits made to a file by hand after it's loaded
+    get overwritten, use reload() to pick them up.
+    """
+
+    def __init__(self, delay=2.0, max_pending=100):
+        self.delay = delay
+        self.max_pending = max_pending
+        self.writes = 0
+        self._docs = {}
+        self._dirty = set()
+        self._pending = 0
+        self._timer = None
+        self._lock = threading.RLock()
+        self._write_lock = threading.Lock()
+
+    def load(self, file):
+        """Returns the in memory copy of a file, reading it the first time."""
+        with self._lock:
+            data = self._docs.get(file)
+            if data is None:
+                try:
+                    with open(file, "r") as jsonFile:
+                        data = self._docs[file] = json.load(jsonFile)
+                except FileNotFoundError:
+                    raise FileNotFoundError("The file you tried to get does not exist...")
+            return data
+
+    def reload(self, file):
+        """Drops the in memory copy (after writing pending changes) so the next load reads the file."""
+        self.flush()
+        with self._lock:
+            self._docs.pop(file, None)
+
+    def change(self, file, value, changeto):
+        with self._lock:
+            self.load(file)[value] = changeto
+            self._mark(file)
 
-    data[value] = changeto
-    with open(file, "w") as jsonFile:
-        json.dump(data, jsonFile, indent=2)
+    def append(self, file, value, addition):
+        with self._lock:
+            self.load(file)[value].append(addition)
+            self._mark(file)
+
+    def _mark(self, file):
+        self._dirty.add(file)
+        self._pending += 1
+        if self._pending >= self.max_pending:
+            self._start(0)
+        elif self._timer is None:
+            self._start(self.delay)
+
+    def _start(self, delay):
+        if self._timer is not None:
+            self._timer.cancel()
+        self._timer = threading.Timer(delay, self.flush)
+        self._timer.daemon = True
+        self._timer.start()
+
+    def flush(self):
+        """Writes every dirty file now, returns how many were written."""
+        # the write lock is taken first so snapshots hit the disk in the order they were taken
+        with self._write_lock:
+            with self._lock:
+                if self._timer is not None:
+                    self._timer.cancel()
+                    self._timer = None
+                texts = [(file, json.dumps(self._docs[file], indent=2)) for file in self._dirty]
+                self._dirty.clear()
+                self._pending = 0
+            for file, text in texts:
+                _write_atomic(file, text)
+            self.writes += len(texts)
+        return len(texts)
+
+
+store = WriteBehind()
+atexit.register(store.flush)
+
+
+def change_value(file, value, changeto):
+    store.change(file, value, changeto)
 
 
 def append_value(file, value, addition):
-    try:
-        with open(file, "r") as jsonFile:
-            data = json.load(jsonFile)
-    except FileNotFoundError:
-        raise FileNotFoundError("The file you tried to get does not exist...")
-
-    data[value].append(addition)
-    with open(file, "w") as jsonFile:
-        json.dump(data, jsonFile, indent=2)
+    store.append(file, value, addition)
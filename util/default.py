@@ -1,13 +1,42 @@
+import os
 import time
 import json
 
 from collections import namedtuple
+from functools import lru_cache
+
+
+# parsed files by path, kept with the (mtime, size) they were read at
+_documents = {}
+
+
+@lru_cache(maxsize=256)
+def _record(keys):
+    # one class per key signature instead of one per object
+    return namedtuple('X', keys, rename=True)
+
+
+def _object_hook(d):
+    return _record(tuple(d))(*d.values())
 
 
 def get(file):
+    """
+    Loads a JSON file with attribute access (data.key).
+
+    The result is cached until the file's mtime or size changes, so treat it
+    as read only, every caller gets the same object.
+    """
     try:
+        stat = os.stat(file)
+        stamp = (stat.st_mtime_ns, stat.st_size)
+        cached = _documents.get(file)
+        if cached is not None and cached[0] == stamp:
+            return cached[1]
         with open(file, encoding='utf8') as data:
-            return json.load(data, object_hook=lambda d: namedtuple('X', d.keys())(*d.values()))
+            document = json.load(data, object_hook=_object_hook)
+        _documents[file] = (stamp, document)
+        return document
     except AttributeError:
         raise AttributeError("Unknown argument")
     except FileNotFoundError:
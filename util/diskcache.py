@@ -0,0 +1,154 @@
+import asyncio
+import hashlib
+import os
+import sqlite3
+import time
+
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor
+from email.utils import parsedate_to_datetime
+
+
+Entry = namedtuple('Entry', 'body charset etag last_modified expires')
+
+SCHEMA = '''
+CREATE TABLE IF NOT EXISTS responses (
+    key TEXT PRIMARY KEY,
+    url TEXT,
+    body BLOB,
+    charset TEXT,
+    etag TEXT,
+    last_modified TEXT,
+    expires REAL,
+    size INTEGER,
+    accessed REAL
+)
+'''
+
+
+def make_key(*parts):
+    return hashlib.sha1(repr(parts).encode('utf8')).hexdigest()
+
+
+def freshness(headers, default_ttl=None):
+    '''How long a response stays fresh going by its headers.
+
+    Returns None if it must not be stored at all (no-store), 0 if it has
+    to be revalidated before every use, else seconds.
+    '''
+    control = {}
+    for part in headers.get('Cache-Control', '').split(','):
+        name, _, value = part.strip().partition('=')
+        if name:
+            control[name.lower()] = value.strip('"')
+    if 'no-store' in control:
+        return None
+    if 'no-cache' in control:
+        return 0
+    for name in ('s-maxage', 'max-age'):
+        if name in control:
+            try:
+                return max(int(control[name]) - int(headers.get('Age', 0) or 0), 0)
+            except ValueError:
+                return 0
+    if 'Expires' in headers:
+        try:
+            return max(parsedate_to_datetime(headers['Expires']).timestamp() - time.time(), 0)
+        except (TypeError, ValueError):
+            return 0
+    return default_ttl or 0
+
+
+class DiskCache:
+    '''Response bodies in a SQLite file so they survive a restart.
+
+    sqlite runs on its own thread, the event loop only ever awaits it. The
+    file is kept under max_bytes by dropping the least recently used rows.
+    '''
+
+    def __init__(self, path='data/http_cache.db', max_bytes=64 * 1024 ** 2):
+        self.path = path
+        self.max_bytes = max_bytes
+        self._executor = ThreadPoolExecutor(max_workers=1)
+        self._db = None
+        self._size = 0
+        self.hits = 0
+        self.misses = 0
+        self.revalidated = 0
+        self.evictions = 0
+
+    def _connect(self):
+        if self._db is None:
+            os.makedirs(os.path.dirname(self.path) or '.', exist_ok=True)
+            self._db = sqlite3.connect(self.path, check_same_thread=False)
+            self._db.execute('PRAGMA journal_mode=WAL')
+            self._db.execute(SCHEMA)
+            self._size = self._db.execute('SELECT COALESCE(SUM(size), 0) FROM responses').fetchone()[0]
+        return self._db
+
+    def _run(self, func, *args):
+        return asyncio.get_event_loop().run_in_executor(self._executor, func, *args)
+
+    def _get(self, key):
+        db = self._connect()
+        row = db.execute('SELECT body, charset, etag, last_modified, expires FROM responses WHERE key = ?',
+                         (key,)).fetchone()
+        if row is None:
+            return None
+        db.execute('UPDATE responses SET accessed = ? WHERE key = ?', (time.time(), key))
+        db.commit()
+        return Entry(bytes(row[0]), *row[1:])
+
+    def _put(self, key, url, body, charset, etag, last_modified, expires):
+        db = self._connect()
+        old = db.execute('SELECT size FROM responses WHERE key = ?', (key,)).fetchone()
+        db.execute('INSERT OR REPLACE INTO responses VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)',
+                   (key, url, body, charset, etag, last_modified, expires, len(body), time.time()))
+        self._size += len(body) - (old[0] if old else 0)
+        while self._size > self.max_bytes:
+            rows = db.execute('SELECT key, size FROM responses ORDER BY accessed LIMIT 32').fetchall()
+            if not rows:
+                break
+            for dropped, size in rows:
+                db.execute('DELETE FROM responses WHERE key = ?', (dropped,))
+                self._size -= size
+                self.evictions += 1
+                if self._size <= self.max_bytes:
+                    break
+        db.commit()
+
+    def _touch(self, key, expires):
+        db = self._connect()
+        db.execute('UPDATE responses SET expires = ?, accessed = ? WHERE key = ?', (expires, time.time(), key))
+        db.commit()
+
+    async def get(self, key):
+        entry = await self._run(self._get, key)
+        if entry is None:
+            self.misses += 1
+        return entry
+
+    async def put(self, key, url, body, charset=None, etag=None, last_modified=None, ttl=0):
+        await self._run(self._put, key, url, body, charset, etag, last_modified, time.time() + ttl)
+
+    async def touch(self, key, ttl=0):
+        self.revalidated += 1
+        await self._run(self._touch, key, time.time() + ttl)
+
+    def stats(self):
+        return {
+            'bytes': self._size,
+            'max_bytes': self.max_bytes,
+            'hits': self.hits,
+            'misses': self.misses,
+            'revalidated': self.revalidated,
+            'evictions': self.evictions,
+        }
+
+    def close(self):
+        def _close():
+            if self._db is not None:
+                self._db.close()
+                self._db = None
+        self._executor.submit(_close).result()
+        self._executor.shutdown()
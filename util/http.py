@@ -1,36 +1,237 @@
 import asyncio
+import json
+import random
+import time
 import aiohttp
 
-from util import cache
+from collections import Counter, namedtuple
+from urllib.parse import urlsplit
 
+from util import cache, diskcache
 
-# Removes the aiohttp ClientSession instance warning.
-class HTTPSession(aiohttp.ClientSession):
-    """ Abstract class for aiohttp. """
 
-    def __init__(self, loop=None):
-        super().__init__(loop=loop or asyncio.get_event_loop())
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+IDEMPOTENT = {"GET", "HEAD", "OPTIONS"}
 
-    def __del__(self):
-        """
-        Closes the ClientSession instance
-        cleanly when the instance is deleted.
+# what request(res_method="raw") gives back
+Raw = namedtuple("Raw", "status headers body charset")
+
+
+class HTTPClient:
+    """
+    The one aiohttp session every cog shares.
+
+    It has a tuned connection pool with DNS caching, a concurrency cap per
+    host on top of that, sane timeouts, and exponential backoff retries for
+    idempotent requests. It also counts enough to tell when the pool is
+    saturated.
+    """
+
+    def __init__(self, limit=100, limit_per_host=10, dns_ttl=300, timeout=30,
+                 connect_timeout=10, retries=3, backoff=0.5, host_limits=None):
+        self.limit = limit
+        self.limit_per_host = limit_per_host
+        self.host_limits = host_limits or {}
+        self.dns_ttl = dns_ttl
+        self.timeout = timeout
+        self.connect_timeout = connect_timeout
+        self.retries = retries
+        self.backoff = backoff
+        self._session = None
+        self.disk = None
+        self.default_ttl = None
+        self._hosts = {}
+        self.active = Counter()
+        self.waiting = Counter()
+        self.counter = Counter()
+
+    @property
+    def session(self):
+        """The shared ClientSession, made on first use so it lands on the running loop."""
+        if self._session is None or self._session.closed:
+            connector = aiohttp.TCPConnector(
+                limit=self.limit,
+                limit_per_host=self.limit_per_host,
+                use_dns_cache=True,
+                ttl_dns_cache=self.dns_ttl)
+            self._session = aiohttp.ClientSession(
+                connector=connector,
+                timeout=aiohttp.ClientTimeout(total=self.timeout, connect=self.connect_timeout))
+        return self._session
+
+    def _semaphore(self, host):
+        sem = self._hosts.get(host)
+        if sem is None:
+            sem = self._hosts[host] = asyncio.Semaphore(self.host_limits.get(host, self.limit_per_host))
+        return sem
 
-        Useful for things like when the interpreter closes.
+    def _delay(self, attempt, res=None):
+        if res is not None and res.status == 429:
+            try:
+                return min(float(res.headers.get("Retry-After")), 30.0)
+            except (TypeError, ValueError):
+                pass
+        return self.backoff * 2 ** attempt * (0.5 + random.random())
 
-        This would be perfect if discord.py had this as well. :thinking:
+    async def request(self, method, url, res_method="text", *args, retries=None,
+                      raise_for_status=False, **kwargs):
+        """Does a request and returns the body read with res_method."""
+        method = method.upper()
+        host = urlsplit(str(url)).hostname
+        retries = self.retries if retries is None else retries
+        if method not in IDEMPOTENT:
+            retries = 0
+        sem = self._semaphore(host)
+
+        attempt = 0
+        while True:
+            delay = None
+            self.waiting[host] += 1
+            try:
+                await sem.acquire()
+            finally:
+                # cancelled while queued counts as done waiting too
+                self.waiting[host] -= 1
+            self.active[host] += 1
+            self.counter["requests"] += 1
+            try:
+                async with self.session.request(method, url, *args, **kwargs) as res:
+                    if res.status in RETRY_STATUSES and attempt < retries:
+                        delay = self._delay(attempt, res)
+                    else:
+                        if raise_for_status:
+                            res.raise_for_status()
+                        if res_method == "raw":
+                            return Raw(res.status, res.headers, await res.read(), res.charset)
+                        return await getattr(res, res_method)()
+            except (aiohttp.ClientConnectionError, asyncio.TimeoutError):
+                self.counter["errors"] += 1
+                if attempt >= retries:
+                    raise
+                delay = self._delay(attempt)
+            finally:
+                self.active[host] -= 1
+                sem.release()
+            self.counter["retries"] += 1
+            attempt += 1
+            await asyncio.sleep(delay)
+
+    def stats(self):
+        """Pool usage, overall and for the busiest hosts."""
+        in_use = sum(self.active.values())
+        hosts = {}
+        for host in set(self.active) | set(self.waiting):
+            if self.active[host] or self.waiting[host]:
+                limit = self.host_limits.get(host, self.limit_per_host)
+                hosts[host] = {
+                    "active": self.active[host],
+                    "waiting": self.waiting[host],
+                    "saturation": self.active[host] / limit,
+                }
+        return {
+            "in_use": in_use,
+            "waiting": sum(self.waiting.values()),
+            "limit": self.limit,
+            "saturation": in_use / self.limit,
+            "requests": self.counter["requests"],
+            "retries": self.counter["retries"],
+            "errors": self.counter["errors"],
+            "hosts": hosts,
+        }
+
+    def enable_disk_cache(self, path="data/http_cache.db", max_bytes=64 * 1024 ** 2, default_ttl=None):
         """
-        if not self.closed:
-            return self.close()
+        Keeps cacheable GET responses in a SQLite file too, so a restart
+        doesn't start cold. default_ttl is used for responses that don't
+        say how long they stay fresh.
+        """
+        self.disk = diskcache.DiskCache(path, max_bytes)
+        self.default_ttl = default_ttl
+
+    async def close(self):
+        if self._session is not None and not self._session.closed:
+            await self._session.close()
+        if self.disk is not None:
+            self.disk.close()
+
+
+client = HTTPClient()
+
+
+async def _query(url, method, res_method, *args, **kwargs):
+    return await client.request(method, url, res_method, *args, **kwargs)
+
+
+def _decode(body, charset, res_method):
+    if res_method == "read":
+        return body
+    text = body.decode(charset or "utf-8", errors="replace")
+    if res_method == "json":
+        return json.loads(text)
+    return text
+
+
+async def _disk_query(url, method, res_method, *args, ttl=None, **kwargs):
+    """
+    Goes to the disk tier before the network.
+
+    Fresh entries are used as they are. Stale ones with an ETag or
+    Last-Modified get revalidated with a conditional request, and a 304
+    just renews them. ttl, if given, overrides how long a response stays
+    fresh, but never stores a no-store response.
+    """
+    disk = client.disk
+    key = diskcache.make_key(url, method, cache.freeze(args), cache.freeze(kwargs))
+    entry = await disk.get(key)
+    if entry is not None and entry.expires > time.time():
+        disk.hits += 1
+        return _decode(entry.body, entry.charset, res_method)
+
+    headers = dict(kwargs.pop("headers", None) or {})
+    if entry is not None:
+        if entry.etag:
+            headers["If-None-Match"] = entry.etag
+        if entry.last_modified:
+            headers["If-Modified-Since"] = entry.last_modified
+
+    res = await client.request(method, url, "raw", *args, headers=headers, **kwargs)
+    fresh = diskcache.freshness(res.headers, client.default_ttl)
+    if fresh is not None and ttl is not None:
+        fresh = ttl
+
+    if res.status == 304 and entry is not None:
+        await disk.touch(key, fresh or 0)
+        return _decode(entry.body, entry.charset, res_method)
+
+    if res.status == 200 and fresh is not None:
+        await disk.put(key, url, res.body, res.charset, res.headers.get("ETag"),
+                       res.headers.get("Last-Modified"), fresh)
+    return _decode(res.body, res.charset, res_method)
+
 
+# bodies can be images, so the memory tier is bounded by size too
+@cache.async_cache(maxsize=256, ttl=300, maxbytes=16 * 1024 ** 2)
+async def _cached_query(url, method, res_method, *args, **kwargs):
+    if client.disk is not None and method == "get":
+        return await _disk_query(url, method, res_method, *args, **kwargs)
+    kwargs.pop("ttl", None)
+    return await _query(url, method, res_method, *args, **kwargs)
 
-session = HTTPSession()
 
+async def query(url, method="get", res_method="text", *args, no_cache=None, **kwargs):
+    """
+    Does a request and returns the body read with res_method.
 
-@cache.async_cache()
-async def query(url, method="get", res_method="text", *args, **kwargs):
-    async with getattr(session, method.lower())(url, *args, **kwargs) as res:
-        return await getattr(res, res_method)()
+    Only GETs are cached (and coalesced, so concurrent callers share one
+    request) unless no_cache says otherwise. With the disk tier enabled
+    cached GETs also survive restarts, ttl=seconds overrides how long.
+    """
+    if no_cache is None:
+        no_cache = method.lower() != "get"
+    if no_cache:
+        kwargs.pop("ttl", None)
+        return await _query(url, method, res_method, *args, **kwargs)
+    return await _cached_query(url, method.lower(), res_method, *args, **kwargs)
 
 
 async def get(url, *args, **kwargs):
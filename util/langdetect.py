@@ -0,0 +1,172 @@
+import json
+import math
+import re
+
+from collections import Counter
+
+
+# scripts that only one language in data/langs.json is written in (ranges are inclusive),
+# hebrew and yiddish share theirs so that block only gets a group name
+SCRIPTS = [
+    (0x0370, 0x03FF, 'el'),
+    (0x0530, 0x058F, 'hy'),
+    (0x0590, 0x05FF, 'hebrew'),
+    (0x0E00, 0x0E7F, 'th'),
+    (0x10A0, 0x10FF, 'ka'),
+    (0x1100, 0x11FF, 'ko'),
+    (0x3040, 0x30FF, 'ja'),
+    (0x3130, 0x318F, 'ko'),
+    (0xAC00, 0xD7AF, 'ko'),
+]
+HAN = (0x4E00, 0x9FFF)
+CYRILLIC = (0x0400, 0x04FF)
+# scripts several languages are written in, text in these needs a profile to be told apart
+SHARED = ('latin', 'cyrillic', 'hebrew')
+
+_not_letters = re.compile(r'[\W\d_]+')
+
+
+def _script(text):
+    '''The script most letters are in, as a language for scripts only one language uses, else 'zh' or one of SHARED (None without letters).'''
+    counts = Counter()
+    for ch in text:
+        if not ch.isalpha():
+            continue
+        o = ord(ch)
+        if o < 0x80:
+            counts['latin'] += 1
+            continue
+        for low, high, code in SCRIPTS:
+            if low <= o <= high:
+                counts[code] += 1
+                break
+        else:
+            if HAN[0] <= o <= HAN[1]:
+                counts['zh'] += 1
+            elif CYRILLIC[0] <= o <= CYRILLIC[1]:
+                counts['cyrillic'] += 1
+            else:
+                counts['latin'] += 1
+    # japanese and korean are written with han characters mixed in
+    for code in ('ja', 'ko'):
+        if counts[code]:
+            counts[code] += counts.pop('zh', 0)
+    best = counts.most_common(1)
+    return best[0][0] if best else None
+
+
+def _grams(text):
+    grams = []
+    for word in _not_letters.sub(' ', text.lower()).split():
+        word = f' {word} '
+        for n in (1, 2, 3):
+            grams.extend(word[i:i + n] for i in range(len(word) - n + 1) if word[i:i + n] != ' ')
+    return grams
+
+
+class Detector:
+    '''Offline language guess from character 1-3 gram profiles.
+
+    Languages with their own script are recognised from that alone, the
+    rest are scored naive Bayes style against profiles built from sample
+    text (data/langsamples.json). Per gram it's one dict lookup plus a few
+    additions, so a message takes microseconds.
+
+    The winner is only the best of the languages that have a profile, so
+    detect() also needs it to be clearly ahead of the runner up and to
+    know at least min_coverage of the text's trigrams, which text in a
+    language without a profile doesn't (it's scored against the closest
+    profile it shares letters with). Anything unsure comes back as None.
+    Short text is always unsure, a few words score well against too many
+    languages to mean anything.
+    '''
+
+    def __init__(self, samples, languages=None, top=400, min_letters=40, margin=0.15, min_coverage=0.5):
+        self.min_letters = min_letters
+        self.margin = margin
+        self.min_coverage = min_coverage
+        self.codes = {}
+        self.base = {}
+        self.index = {}
+        self.trigrams = {}
+        groups = {}
+        for code, text in samples.items():
+            if languages is not None and code not in languages:
+                continue
+            groups.setdefault(_script(text), []).append((code, text))
+
+        for group, entries in groups.items():
+            codes = [code for code, _ in entries]
+            self.codes[group] = codes
+            index = self.index[group] = {}
+            unseen = []
+            for i, (code, text) in enumerate(entries):
+                counts = Counter(_grams(text)).most_common(top)
+                self.trigrams[code] = {gram for gram, _ in counts if len(gram) == 3}
+                total = sum(n for _, n in counts) + top
+                floor = math.log(1 / total)
+                unseen.append(floor)
+                for gram, n in counts:
+                    # stored as the gain over an unseen gram, so unseen grams cost nothing to score
+                    index.setdefault(gram, []).append((i, math.log((n + 1) / total) - floor))
+            self.base[group] = unseen
+
+    @classmethod
+    def from_files(cls, samples='data/langsamples.json', languages='data/langs.json'):
+        try:
+            with open(samples, encoding='utf8') as f:
+                samples = json.load(f)
+        except (FileNotFoundError, ValueError):
+            samples = {}
+        try:
+            with open(languages, encoding='utf8') as f:
+                languages = set(json.load(f))
+        except (FileNotFoundError, ValueError):
+            languages = None
+        return cls(samples, languages)
+
+    def scores(self, text):
+        '''(group, [(code, average log likelihood per gram)]) best first.'''
+        group = _script(text)
+        codes = self.codes.get(group)
+        if codes is None:
+            return group, []
+        grams = _grams(text)
+        if not grams:
+            return group, []
+        n = len(grams)
+        totals = [floor * n for floor in self.base[group]]
+        index = self.index[group]
+        for gram in grams:
+            for i, gain in index.get(gram, ()):
+                totals[i] += gain
+        ranked = sorted(zip(codes, (t / n for t in totals)), key=lambda x: x[1], reverse=True)
+        return group, ranked
+
+    def detect(self, text):
+        '''Language code of the text, or None if it can't tell.'''
+        group, ranked = self.scores(text)
+        if group is not None and group not in self.codes and group not in SHARED:
+            return group
+        if not ranked or sum(ch.isalpha() for ch in text) < self.min_letters:
+            return None
+        if len(ranked) > 1 and ranked[0][1] - ranked[1][1] < self.margin:
+            return None
+        code = ranked[0][0]
+        if self.coverage(text, code) < self.min_coverage:
+            return None
+        return code
+
+    def coverage(self, text, code):
+        '''How much of the text's trigrams the profile of that language has seen.'''
+        trigrams = [gram for gram in _grams(text) if len(gram) == 3]
+        if not trigrams:
+            return 0.0
+        known = self.trigrams.get(code, ())
+        return sum(gram in known for gram in trigrams) / len(trigrams)
+
+    def detect_many(self, texts):
+        return [self.detect(text) for text in texts]
+
+
+detector = Detector.from_files()
@@ -0,0 +1,302 @@
+import asyncio
+import bisect
+import time
+
+from array import array
+from contextlib import contextmanager
+
+
+def _buckets(low=0.5, high=60000.0, factor=1.25):
+    bounds = []
+    bound = low
+    while bound < high:
+        bounds.append(bound)
+        bound *= factor
+    bounds.append(high)
+    return bounds
+
+
+class Histogram:
+    '''Latency histogram in milliseconds with fixed, log spaced buckets.
+
+    Recording is a bisect and an increment, memory doesn't grow with the
+    number of samples. Percentiles are read from the bucket bounds, so
+    they're within one bucket (25%) of the real value. With windows the
+    bucket counts are also rolled up into rings by Registry.tick(), for
+    percentiles over just the last minute, hour or day.
+    '''
+
+    def __init__(self, name, bounds=None, windows=None):
+        self.name = name
+        self.bounds = bounds or _buckets()
+        self.counts = [0] * (len(self.bounds) + 1)
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+        self._seen = list(self.counts)
+        self.rings = {window: Ring(*size, width=len(self.counts)) for window, size in (windows or {}).items()}
+
+    def observe(self, ms):
+        self.counts[bisect.bisect_left(self.bounds, ms)] += 1
+        self.count += 1
+        self.total += ms
+        if ms > self.max:
+            self.max = ms
+
+    @contextmanager
+    def time(self):
+        '''Records how long the block took.'''
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe((time.perf_counter() - start) * 1000)
+
+    def _tick(self, now):
+        changed = [(i, n - seen) for i, (n, seen) in enumerate(zip(self.counts, self._seen)) if n != seen]
+        self._seen = list(self.counts)
+        for ring in self.rings.values():
+            ring.add_row(now, changed)
+
+    def _counts(self, window):
+        if window is None:
+            return self.counts
+        return self.rings[window].columns(time.monotonic())
+
+    def percentile(self, p, window=None):
+        '''p-th percentile since start, or over a window if it has one.'''
+        counts = self._counts(window)
+        count = sum(counts)
+        if not count:
+            return 0.0
+        rank = p / 100 * count
+        seen = 0
+        for i, n in enumerate(counts):
+            seen += n
+            if n and seen >= rank:
+                return min(self.bounds[i] if i < len(self.bounds) else self.max, self.max)
+        return self.max
+
+    def summary(self, window=None):
+        if window is not None:
+            count = int(sum(self._counts(window)))
+            if not count:
+                return f'{self.name} ({window}): no samples'
+            return (f'{self.name} ({window}): {count} samples, '
+                    f'p50 {self.percentile(50, window):.1f}ms p95 {self.percentile(95, window):.1f}ms '
+                    f'p99 {self.percentile(99, window):.1f}ms')
+        if not self.count:
+            return f'{self.name}: no samples'
+        return (f'{self.name}: {self.count} samples, avg {self.total / self.count:.1f}ms, '
+                f'p50 {self.percentile(50):.1f}ms p95 {self.percentile(95):.1f}ms '
+                f'p99 {self.percentile(99):.1f}ms max {self.max:.1f}ms')
+
+
+NAN = float('nan')
+
+# (seconds per slot, slots) for the last minute, hour and day
+WINDOWS = {'1m': (1, 60), '1h': (60, 60), '24h': (600, 144)}
+
+
+class Ring:
+    '''A fixed window of slots in a preallocated array, old slots are reset to empty as time moves on.
+
+    With width > 1 every slot is a row of width values, a histogram's bucket counts.
+    '''
+
+    __slots__ = ('step', 'width', 'values', 'last', 'empty')
+
+    def __init__(self, step, slots, empty=0.0, width=1):
+        self.step = step
+        self.width = width
+        self.empty = empty
+        self.values = array('d', [empty]) * (slots * width)
+        self.last = None
+
+    def _advance(self, now):
+        '''Index of the current slot's first value.'''
+        slot = int(now // self.step)
+        size = len(self.values) // self.width
+        if self.last is None:
+            self.last = slot
+        elif slot > self.last:
+            blank = array('d', [self.empty]) * self.width
+            for s in range(self.last + 1, min(slot, self.last + size) + 1):
+                start = s % size * self.width
+                self.values[start:start + self.width] = blank
+            self.last = slot
+        return slot % size * self.width
+
+    def add(self, now, value):
+        self.values[self._advance(now)] += value
+
+    def set(self, now, value):
+        self.values[self._advance(now)] = value
+
+    def total(self, now):
+        self._advance(now)
+        return sum(self.values)
+
+    def series(self, now):
+        '''Slot values oldest first.'''
+        i = self._advance(now) + 1
+        return list(self.values[i:]) + list(self.values[:i])
+
+    def add_row(self, now, changes):
+        '''Adds (column, value) pairs to the current slot's row.'''
+        start = self._advance(now)
+        for column, value in changes:
+            self.values[start + column] += value
+
+    def columns(self, now):
+        '''Every column summed over the window.'''
+        self._advance(now)
+        return [sum(self.values[i::self.width]) for i in range(self.width)]
+
+
+class Counter:
+    '''inc() is one addition, the per window rollups are done by Registry.tick().'''
+
+    __slots__ = ('name', 'value', '_seen', 'rings')
+
+    def __init__(self, name):
+        self.name = name
+        self.value = 0
+        self._seen = 0
+        self.rings = {window: Ring(*size) for window, size in WINDOWS.items()}
+
+    def inc(self, n=1):
+        self.value += n
+
+    def _tick(self, now):
+        delta, self._seen = self.value - self._seen, self.value
+        for ring in self.rings.values():
+            ring.add(now, delta)
+
+    def total(self, window):
+        return self.rings[window].total(time.monotonic())
+
+
+class Gauge:
+    '''A value that's set, or read from func every tick. The rings keep the last value per slot.'''
+
+    __slots__ = ('name', 'value', 'func', 'rings')
+
+    def __init__(self, name, func=None):
+        self.name = name
+        self.value = 0
+        self.func = func
+        # nan marks slots with no sample yet, so they don't read as zero
+        self.rings = {window: Ring(*size, empty=NAN) for window, size in WINDOWS.items()}
+
+    def range(self, window):
+        '''(min, max) over the window, None if nothing was sampled in it.'''
+        values = [v for v in self.rings[window].series(time.monotonic()) if v == v]
+        return (min(values), max(values)) if values else None
+
+    def set(self, value):
+        self.value = value
+
+    def _tick(self, now):
+        if self.func is not None:
+            try:
+                self.value = self.func()
+            except Exception:
+                return
+        for ring in self.rings.values():
+            ring.set(now, self.value)
+
+
+class Registry:
+    '''Every counter, gauge and histogram by name.
+
+    Counters, gauges and histograms are rolled up into 1m/1h/24h rings
+    once a second by one task, so recording anything never does more than
+    an addition (and a bisect for histograms).
+    '''
+
+    def __init__(self, interval=1.0):
+        self.interval = interval
+        self.counters = {}
+        self.gauges = {}
+        self.histograms = {}
+        self.started = time.time()
+        self._task = None
+
+    def counter(self, name):
+        metric = self.counters.get(name)
+        if metric is None:
+            metric = self.counters[name] = Counter(name)
+        return metric
+
+    def gauge(self, name, func=None):
+        metric = self.gauges.get(name)
+        if metric is None:
+            metric = self.gauges[name] = Gauge(name, func)
+        elif func is not None:
+            metric.func = func
+        return metric
+
+    def histogram(self, name):
+        hist = self.histograms.get(name)
+        if hist is None:
+            hist = self.histograms[name] = Histogram(name, windows=WINDOWS)
+        return hist
+
+    def tick(self, now=None):
+        now = time.monotonic() if now is None else now
+        for metric in self.counters.values():
+            metric._tick(now)
+        for metric in self.gauges.values():
+            metric._tick(now)
+        for metric in self.histograms.values():
+            metric._tick(now)
+
+    def start(self, loop):
+        if self._task is None:
+            self._task = loop.create_task(self._run())
+
+    def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+
+    async def _run(self):
+        while True:
+            self.tick()
+            await asyncio.sleep(self.interval)
+
+
+registry = Registry()
+histograms = registry.histograms
+counter = registry.counter
+gauge = registry.gauge
+histogram = registry.histogram
+
+
+def format_histograms(window=None):
+    return '\n'.join(hist.summary(window) for hist in histograms.values())
+
+
+def format_gauges(names=None):
+    '''One line per gauge, the current value and its range over the last hour and day.'''
+    lines = []
+    for name in names or sorted(registry.gauges):
+        metric = registry.gauge(name)
+        line = f'{name}: {metric.value:.1f}'
+        for window in ('1h', '24h'):
+            found = metric.range(window)
+            if found is not None:
+                line += f' ({found[0]:.1f}-{found[1]:.1f} over {window})'
+        lines.append(line)
+    return '\n'.join(lines)
+
+
+def format_counters(names=None):
+    '''One line per counter, the total since start and over the last minute, hour and day.'''
+    lines = []
+    for name in names or sorted(registry.counters):
+        metric = registry.counter(name)
+        lines.append(f"{name}: {metric.value} ({metric.total('1m'):.0f}/1m "
+                     f"{metric.total('1h'):.0f}/1h {metric.total('24h'):.0f}/24h)")
+    return '\n'.join(lines)
@@ -1,11 +1,11 @@
 import discord
 
-from util import repo
+from util.acl import acl
 from discord.ext import commands
 
 
 async def check_permissions(ctx, perms, *, check=all):
-    if ctx.author.id in repo.owners:
+    if acl.is_owner(ctx.author.id):
         return True
 
     resolved = ctx.channel.permissions_for(ctx.author)
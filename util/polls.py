@@ -0,0 +1,150 @@
+import asyncio
+import heapq
+import time
+
+import discord
+
+
+EMOJI = ['1⃣', '2⃣', '3⃣', '4⃣', '5⃣', '6⃣', '7⃣', '8⃣', '9⃣']
+
+
+def _emoji_index(emoji):
+    # clients sometimes send the keycaps with a variation selector, sometimes without
+    try:
+        return EMOJI.index(str(emoji).replace('\ufe0f', ''))
+    except ValueError:
+        return None
+
+
+class Poll:
+    __slots__ = ('message_id', 'channel_id', 'question', 'options', 'ends_at', 'counts')
+
+    def __init__(self, message_id, channel_id, question, options, ends_at, counts=None):
+        self.message_id = message_id
+        self.channel_id = channel_id
+        self.question = question
+        self.options = options
+        self.ends_at = ends_at
+        self.counts = counts or [0] * len(options)
+
+    def to_json(self):
+        return {'channel': self.channel_id, 'question': self.question,
+                'options': self.options, 'ends_at': self.ends_at}
+
+    @classmethod
+    def from_json(cls, message_id, data):
+        return cls(int(message_id), data['channel'], data['question'], data['options'], data['ends_at'])
+
+    def results(self):
+        end_msg = "The poll is over. The results:\n\n"
+        for idx, option in enumerate(self.options):
+            end_msg += "{} {} - {} votes\n".format(EMOJI[idx], option, self.counts[idx])
+        top = max(self.counts)
+        top_results = [option for option, count in zip(self.options, self.counts) if count == top]
+        if len(top_results) > 1:
+            end_msg += "\nThe victory is tied between: {}".format(", ".join(top_results))
+        else:
+            end_msg += "\n{} is the winner!".format(top_results[0])
+        return end_msg
+
+
+class PollManager:
+    '''Reaction polls, counted live and closed on time.
+
+    Votes come from the raw reaction events, so nothing has to be fetched
+    to count them. Open polls are kept in storage ('polls') and picked up
+    again after a restart, the tally for those is read once from the
+    message since votes may have come in while the bot was down. One task
+    sleeps until the next poll is due.
+    '''
+
+    def __init__(self, bot, storage, namespace='polls'):
+        self.bot = bot
+        self.storage = storage
+        self.namespace = namespace
+        self.polls = {}
+        self._due = []
+        self._wakeup = asyncio.Event()
+        self._task = None
+
+    def start(self):
+        restored = []
+        for message_id, data in self.storage.all(self.namespace).items():
+            poll = Poll.from_json(message_id, data)
+            self._add(poll)
+            restored.append(poll)
+        self._task = self.bot.loop.create_task(self._run(restored))
+
+    def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+
+    def _add(self, poll):
+        self.polls[poll.message_id] = poll
+        heapq.heappush(self._due, (poll.ends_at, poll.message_id))
+        self._wakeup.set()
+
+    async def open(self, message, question, options, duration):
+        '''Starts counting votes on a poll message that was just sent.'''
+        poll = Poll(message.id, message.channel.id, question, options, time.time() + duration)
+        self._add(poll)
+        await self.storage.set(self.namespace, poll.message_id, poll.to_json())
+        return poll
+
+    def on_reaction(self, payload, delta):
+        poll = self.polls.get(payload.message_id)
+        if poll is None or payload.user_id == self.bot.user.id:
+            return
+        idx = _emoji_index(payload.emoji)
+        if idx is not None and idx < len(poll.options):
+            poll.counts[idx] = max(poll.counts[idx] + delta, 0)
+
+    async def _recount(self, poll):
+        channel = self.bot.get_channel(poll.channel_id)
+        try:
+            message = await channel.get_message(poll.message_id)
+        except (AttributeError, discord.HTTPException):
+            return
+        counts = [0] * len(poll.options)
+        for reaction in message.reactions:
+            idx = _emoji_index(reaction.emoji)
+            if idx is not None and idx < len(counts):
+                counts[idx] = reaction.count - (1 if reaction.me else 0)
+        poll.counts = counts
+
+    async def close(self, poll):
+        self.polls.pop(poll.message_id, None)
+        await self.storage.delete(self.namespace, poll.message_id)
+        channel = self.bot.get_channel(poll.channel_id)
+        if channel is None:
+            return
+        try:
+            await channel.send(poll.results())
+        except discord.HTTPException:
+            pass
+
+    async def _run(self, restored):
+        await self.bot.wait_until_ready()
+        for poll in restored:
+            try:
+                await self._recount(poll)
+            except Exception as e:
+                print(f'polls: could not recount {poll.message_id}: {type(e).__name__}: {e}')
+        while True:
+            self._wakeup.clear()
+            now = time.time()
+            while self._due and self._due[0][0] <= now:
+                _, message_id = heapq.heappop(self._due)
+                poll = self.polls.get(message_id)
+                if poll is None:
+                    continue
+                try:
+                    await self.close(poll)
+                except Exception as e:
+                    # one bad poll shouldn't stop the rest from closing
+                    print(f'polls: could not close {message_id}: {type(e).__name__}: {e}')
+            timeout = self._due[0][0] - now if self._due else None
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout)
+            except asyncio.TimeoutError:
+                pass
@@ -0,0 +1,121 @@
+import json
+import os
+
+
+class PrefixResolver:
+    '''Keeps every prefix in memory so resolving one never touches the disk.
+
+    The global prefix comes from $PREFIX or "PREFIX" in data/config.json,
+    per guild prefixes live in the "prefixes" namespace of the storage (or
+    under "PREFIXES" in the same file without one). Lookups return a prebuilt
+    tuple (longest prefix first) that already has the mention forms.
+    '''
+
+    def __init__(self, path='data/config.json', storage=None):
+        self.path = path
+        self.storage = storage
+        self.user_id = None
+        self._mtime = None
+        self._global = ()
+        self._guilds = {}
+        self._mentions = ()
+        self._resolved = {}
+        self.reload()
+
+    def _read(self):
+        try:
+            mtime = os.stat(self.path).st_mtime
+            with open(self.path, encoding='utf8') as f:
+                return mtime, json.load(f)
+        except FileNotFoundError:
+            return None, {}
+
+    def reload(self):
+        '''Re-reads the config file and rebuilds every prefix tuple.'''
+        self._mtime, config = self._read()
+        prefix = os.environ.get('PREFIX') or config.get('PREFIX')
+        self._global = (prefix,) if prefix else ()
+        guilds = {}
+        if self.storage is not None:
+            stored = self.storage.all('prefixes')
+        else:
+            stored = config.get('PREFIXES') or {}
+        for guild_id, prefixes in stored.items():
+            if isinstance(prefixes, str):
+                prefixes = [prefixes]
+            prefixes = tuple(p for p in prefixes if p)
+            if prefixes:
+                guilds[int(guild_id)] = prefixes
+        self._guilds = guilds
+        self._rebuild()
+
+    def maybe_reload(self):
+        '''Reloads only if the file changed on disk. Returns True if it did.'''
+        try:
+            mtime = os.stat(self.path).st_mtime
+        except FileNotFoundError:
+            mtime = None
+        if mtime == self._mtime:
+            return False
+        self.reload()
+        return True
+
+    def set_user_id(self, user_id):
+        '''Sets the bot user the mention prefixes point at.'''
+        if user_id == self.user_id:
+            return
+        self.user_id = user_id
+        self._mentions = (f'<@!{user_id}> ', f'<@{user_id}> ')
+        self._rebuild()
+
+    def _build(self, prefixes):
+        return tuple(sorted(set(prefixes + self._mentions), key=len, reverse=True))
+
+    def _rebuild(self):
+        resolved = {None: self._build(self._global)}
+        for guild_id, prefixes in self._guilds.items():
+            resolved[guild_id] = self._build(prefixes)
+        # swapped in one go so a lookup never sees a half built table
+        self._resolved = resolved
+
+    def get(self, guild_id=None):
+        '''Returns the prefix tuple for a guild id (or None for DMs).'''
+        resolved = self._resolved
+        try:
+            return resolved[guild_id]
+        except KeyError:
+            return resolved[None]
+
+    def matches(self, content, guild_id=None):
+        '''Cheap check if a message could be a command at all.
+
+        str.startswith with the prebuilt tuple is a single C level scan and
+        exact per guild, so nothing that passes here gets rejected later on
+        account of the prefix.
+        '''
+        return content.startswith(self.get(guild_id))
+
+    @property
+    def active(self):
+        '''Every prefix that is active anywhere.'''
+        return frozenset(p for prefixes in self._resolved.values() for p in prefixes)
+
+    async def set(self, guild_id, prefix=None):
+        '''Sets (or with None clears) a guild prefix and saves it.'''
+        if self.storage is not None:
+            if prefix:
+                await self.storage.set('prefixes', guild_id, prefix)
+            else:
+                await self.storage.delete('prefixes', guild_id)
+            return self.reload()
+        _, config = self._read()
+        guilds = config.setdefault('PREFIXES', {})
+        if prefix:
+            guilds[str(guild_id)] = prefix
+        else:
+            guilds.pop(str(guild_id), None)
+        tmp = f'{self.path}.tmp'
+        with open(tmp, 'w', encoding='utf8') as f:
+            f.write(json.dumps(config, indent=4))
+        os.replace(tmp, self.path)
+        self.reload()
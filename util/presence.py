@@ -0,0 +1,70 @@
+import asyncio
+
+import discord
+
+
+class PresenceManager:
+    '''Batches presence updates so guild churn doesn't spam the gateway.
+
+    touch() only marks shards as needing an update, at most one is pending
+    per shard no matter how many events come in. Every interval seconds the
+    pending shards get the current presence, and only if it's different
+    from what that shard last got. The user count comes from bot.usercount,
+    so building the presence is O(1).
+    '''
+
+    def __init__(self, bot, interval=60.0):
+        self.bot = bot
+        self.interval = interval
+        self.pending = set()
+        self.sent = {}
+        self.updates = 0
+        self._task = None
+        self._lock = asyncio.Lock()
+
+    def activity(self):
+        return discord.Game(type=0, name=f"with {len(self.bot.usercount)} users  | linu help")
+
+    def _shard_ids(self):
+        shards = getattr(self.bot, 'shards', None)
+        return list(shards) if shards else [None]
+
+    def touch(self, shard_id=None):
+        '''Asks for a presence update on one shard, or all of them.'''
+        if shard_id is None:
+            self.pending.update(self._shard_ids())
+        else:
+            self.pending.add(shard_id)
+
+    def start(self):
+        self._task = self.bot.loop.create_task(self._run())
+
+    def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+
+    async def flush(self, force=False):
+        '''Sends the pending updates now, force=True resends even if nothing changed (after a reconnect).'''
+        # on_ready's forced flush and the timer mustn't both send to a shard
+        async with self._lock:
+            pending, self.pending = self.pending, set()
+            activity = self.activity()
+            for shard_id in pending:
+                if not force and self.sent.get(shard_id) == activity.name:
+                    continue
+                kwargs = {} if shard_id is None else {'shard_id': shard_id}
+                try:
+                    await self.bot.change_presence(activity=activity, status=discord.Status.online, **kwargs)
+                except Exception:
+                    # try again next round
+                    self.pending.add(shard_id)
+                    continue
+                self.sent[shard_id] = activity.name
+                self.updates += 1
+
+    async def _run(self):
+        await self.bot.wait_until_ready()
+        while True:
+            await asyncio.sleep(self.interval)
+            if self.pending:
+                await self.flush()
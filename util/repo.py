@@ -1,11 +1,11 @@
-from util import default
+from util.acl import acl
 
 
-owners = default.get("conf.json").owners
-helper = default.get("conf.json").helpers
-
 def is_owner(ctx):
-    return ctx.author.id in owners
+    return acl.is_owner(ctx.author.id)
 
 def is_helper(ctx):
-    return ctx.author.id in helper
+    return acl.is_helper(ctx.author.id)
+
+def is_admin(ctx):
+    return acl.is_admin(ctx.author.id)
@@ -0,0 +1,21 @@
+from ext import fuzzy
+
+
+class RoleIndexes:
+    '''A FuzzyIndex of role names per guild, built on first use.
+
+    The role events drop a guild's index (cogs/events.py), so it's rebuilt
+    only after its roles actually changed instead of on every lookup.
+    '''
+
+    def __init__(self):
+        self.indexes = {}
+
+    def get(self, guild):
+        index = self.indexes.get(guild.id)
+        if index is None:
+            index = self.indexes[guild.id] = fuzzy.FuzzyIndex({r.name.lower(): r for r in guild.roles})
+        return index
+
+    def invalidate(self, guild):
+        self.indexes.pop(guild.id, None)
@@ -0,0 +1,213 @@
+import asyncio
+import json
+import os
+import re
+import time
+import zlib
+
+from ext import fuzzy
+from util import http
+
+
+# project -> (docs root, prefixes stripped from the names)
+PROJECTS = {
+    'rewrite': ('http://discordpy.rtfd.io/en/rewrite/', ('discord.ext.commands.', 'discord.')),
+    'python': ('https://docs.python.org/3/', ()),
+    'aiohttp': ('https://docs.aiohttp.org/en/stable/', ('aiohttp.',)),
+}
+
+_entry = re.compile(r'(?x)(.+?)\s+(\S*:\S*)\s+(-?\d+)\s+(\S+)\s+(.*)')
+
+
+def _lines(data, chunk=16 * 1024):
+    '''Yields the decoded lines of an objects.inv a chunk at a time.'''
+    header, pos = [], 0
+    while len(header) < 4:
+        end = data.index(b'\n', pos)
+        header.append(data[pos:end].decode('utf-8'))
+        pos = end + 1
+    if not header[0].startswith('# Sphinx inventory version 2'):
+        raise ValueError(f'Unsupported inventory: {header[0]}')
+    if 'zlib' not in header[3]:
+        raise ValueError('Inventory is not zlib compressed')
+
+    decompressor = zlib.decompressobj()
+    buffer = b''
+    for start in range(pos, len(data), chunk):
+        buffer += decompressor.decompress(data[start:start + chunk])
+        *lines, buffer = buffer.split(b'\n')
+        for line in lines:
+            yield line.decode('utf-8')
+    buffer += decompressor.flush()
+    for line in buffer.split(b'\n'):
+        if line:
+            yield line.decode('utf-8')
+
+
+def parse_inventory(data, root, strip=()):
+    '''Turns a Sphinx objects.inv into {name: url}, blocking so run it in an executor.'''
+    entries = {}
+    for line in _lines(data):
+        match = _entry.match(line.rstrip())
+        if match is None:
+            continue
+        name, directive, _, location, display = match.groups()
+        domain, _, role = directive.partition(':')
+        if directive == 'std:doc':
+            continue
+        if location.endswith('$'):
+            location = location[:-1] + name
+        key = name if display == '-' else display
+        if domain == 'std':
+            key = f'{role}:{key}'
+        for prefix in strip:
+            if key.startswith(prefix):
+                key = key[len(prefix):]
+                break
+        entries.setdefault(key, root + location)
+    return entries
+
+
+class RTFMIndex:
+    '''Documentation lookups for several projects, built from their objects.inv.
+
+    Every project keeps its entries on disk (data/rtfm/<project>.json) and a
+    prebuilt FuzzyIndex in memory. Stale projects keep answering from what
+    they have while a refresh runs in the background, only a project that has
+    never been fetched makes the caller wait. A project whose fetch failed
+    isn't tried again for retry seconds. start() loads the saved indexes off
+    the loop and then checks every hour for projects older than ttl.
+    '''
+
+    def __init__(self, projects=PROJECTS, path='data/rtfm', ttl=86400, retry=300, scorer=fuzzy.token_sort_ratio):
+        self.projects = projects
+        self.path = path
+        self.ttl = ttl
+        self.retry = retry
+        self.scorer = scorer
+        self.fetched = {}
+        self.failed = {}
+        self.indexes = {}
+        self._building = {}
+        self._loading = None
+        self._task = None
+
+    def _file(self, project):
+        return os.path.join(self.path, f'{project}.json')
+
+    def _make_index(self, entries):
+        index = fuzzy.FuzzyIndex(entries)
+        index.prepare(self.scorer)
+        return index
+
+    def _load(self):
+        loaded = {}
+        for project in self.projects:
+            try:
+                with open(self._file(project), encoding='utf8') as f:
+                    saved = json.load(f)
+            except (FileNotFoundError, ValueError):
+                continue
+            loaded[project] = saved['fetched'], self._make_index(saved['entries'])
+        return loaded
+
+    async def load(self):
+        '''Reads whatever was saved last time, parsing and indexing in the executor.'''
+        loaded = await asyncio.get_event_loop().run_in_executor(None, self._load)
+        for project, (fetched, index) in loaded.items():
+            # a build that finished first has the newer index
+            if project not in self.indexes:
+                self.fetched[project], self.indexes[project] = fetched, index
+
+    def start(self, loop, interval=3600):
+        '''Loads the saved indexes and keeps refreshing stale ones in the background.'''
+        self._loading = loop.create_task(self.load())
+        self._task = loop.create_task(self._run(interval))
+
+    def stop(self):
+        '''Cancels the refresh loop, the initial load and any builds still running.'''
+        for task in (self._task, self._loading, *self._building.values()):
+            if task is not None:
+                task.cancel()
+
+    async def _run(self, interval):
+        await asyncio.shield(self._loading)
+        while True:
+            await self.refresh()
+            await asyncio.sleep(interval)
+
+    def _save(self, project, fetched, entries):
+        os.makedirs(self.path, exist_ok=True)
+        tmp = f'{self._file(project)}.tmp'
+        with open(tmp, 'w', encoding='utf8') as f:
+            json.dump({'fetched': fetched, 'entries': entries}, f)
+        os.replace(tmp, self._file(project))
+
+    def stale(self, project):
+        return time.time() - self.fetched.get(project, 0) > self.ttl
+
+    def backing_off(self, project):
+        return time.time() - self.failed.get(project, 0) < self.retry
+
+    async def _build(self, project):
+        root, strip = self.projects[project]
+        # through the disk tier, a stale inventory is revalidated instead of downloaded again
+        data = await http.get(root + 'objects.inv', res_method='read', raise_for_status=True, ttl=self.ttl)
+        loop = asyncio.get_event_loop()
+
+        def work():
+            entries = parse_inventory(data, root, strip)
+            fetched = time.time()
+            self._save(project, fetched, entries)
+            return fetched, self._make_index(entries)
+
+        self.fetched[project], self.indexes[project] = await loop.run_in_executor(None, work)
+        return self.indexes[project]
+
+    def build(self, project):
+        '''Fetches and indexes one project, concurrent calls share the same task.'''
+        task = self._building.get(project)
+        if task is None:
+            task = self._building[project] = asyncio.ensure_future(self._build(project))
+            task.add_done_callback(lambda t: self._built(project, t))
+        return task
+
+    def _built(self, project, task):
+        self._building.pop(project, None)
+        if task.cancelled() or task.exception() is not None:
+            self.failed[project] = time.time()
+        else:
+            self.failed.pop(project, None)
+
+    async def refresh(self, projects=None, force=False):
+        '''Rebuilds the stale projects (or all of them with force) concurrently.'''
+        todo = [p for p in projects or self.projects
+                if force or (self.stale(p) and not self.backing_off(p))]
+        results = await asyncio.gather(*(self.build(p) for p in todo), return_exceptions=True)
+        for project, result in zip(todo, results):
+            if isinstance(result, Exception):
+                print(f'rtfm: could not refresh {project}: {type(result).__name__}: {result}')
+        return todo
+
+    async def get(self, project):
+        '''The FuzzyIndex for a project, raises RuntimeError if it can't be built.'''
+        if self._loading is not None and not self._loading.done():
+            await asyncio.shield(self._loading)
+        index = self.indexes.get(project)
+        if index is not None:
+            if self.stale(project) and not self.backing_off(project) and project not in self._building:
+                self.build(project).add_done_callback(_consume)
+            return index
+        if self.backing_off(project):
+            raise RuntimeError('Cannot build rtfm lookup table, try again later.')
+        try:
+            return await asyncio.shield(self.build(project))
+        except Exception:
+            raise RuntimeError('Cannot build rtfm lookup table, try again later.')
+
+
+def _consume(task):
+    # background refreshes just log, an old index is still fine to use
+    if not task.cancelled() and task.exception() is not None:
+        e = task.exception()
+        print(f'rtfm: background refresh failed: {type(e).__name__}: {e}')
@@ -0,0 +1,138 @@
+import asyncio
+import json
+import os
+import sqlite3
+
+from concurrent.futures import ThreadPoolExecutor
+
+
+SCHEMA = '''
+CREATE TABLE IF NOT EXISTS kv (
+    namespace TEXT NOT NULL,
+    key TEXT NOT NULL,
+    value TEXT NOT NULL,
+    PRIMARY KEY (namespace, key)
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS meta (
+    key TEXT PRIMARY KEY,
+    value TEXT
+);
+'''
+
+
+class Storage:
+    '''Guild state in one SQLite database (WAL mode).
+
+    Everything is loaded into memory when it opens, so reads are dict
+    lookups. Writes update memory first and then upsert the single row on
+    the storage thread, the event loop never touches sqlite itself.
+    Values are anything json can handle, keys are strings.
+    '''
+
+    def __init__(self, path='data/linu.db'):
+        self.path = path
+        self._executor = ThreadPoolExecutor(max_workers=1)
+        self._db = None
+        self._data = {}
+
+    def _submit(self, func, *args):
+        return self._executor.submit(func, *args)
+
+    def _run(self, func, *args):
+        return asyncio.get_event_loop().run_in_executor(self._executor, func, *args)
+
+    def _open(self):
+        os.makedirs(os.path.dirname(self.path) or '.', exist_ok=True)
+        db = self._db = sqlite3.connect(self.path, check_same_thread=False)
+        db.execute('PRAGMA journal_mode=WAL')
+        db.execute('PRAGMA synchronous=NORMAL')
+        db.executescript(SCHEMA)
+        data = {}
+        for namespace, key, value in db.execute('SELECT namespace, key, value FROM kv'):
+            data.setdefault(namespace, {})[key] = json.loads(value)
+        migrated = db.execute("SELECT value FROM meta WHERE key = 'migrated'").fetchone()
+        return data, migrated is not None
+
+    def open(self, migrate_from='data'):
+        '''Opens the database (blocking, call it once at startup).
+
+        The first time it also copies the old JSON files in.
+        '''
+        self._data, migrated = self._submit(self._open).result()
+        if not migrated:
+            self._submit(self._migrate, migrate_from).result()
+        return self
+
+    def _upsert(self, rows):
+        self._db.executemany('INSERT OR REPLACE INTO kv (namespace, key, value) VALUES (?, ?, ?)', rows)
+        self._db.commit()
+
+    def _delete(self, namespace, key):
+        self._db.execute('DELETE FROM kv WHERE namespace = ? AND key = ?', (namespace, key))
+        self._db.commit()
+
+    @staticmethod
+    def _load_json(path):
+        try:
+            with open(path, encoding='utf8') as f:
+                return json.load(f)
+        except (FileNotFoundError, ValueError):
+            return None
+
+    def _migrate(self, folder):
+        '''One shot copy of the old JSON files, the files are left alone.'''
+        rows = []
+
+        def add(namespace, key, value):
+            self._data.setdefault(namespace, {})[key] = value
+            rows.append((namespace, key, json.dumps(value)))
+
+        welcome = os.path.join(folder, 'welcome')
+        if os.path.isdir(welcome):
+            for file in os.listdir(welcome):
+                guild_id, ext = os.path.splitext(file)
+                data = self._load_json(os.path.join(welcome, file))
+                if ext == '.json' and guild_id.isdigit() and data is not None:
+                    add('welcome', guild_id, data)
+
+        for name in ('tags', 'channels'):
+            for key, value in (self._load_json(os.path.join(folder, f'{name}.json')) or {}).items():
+                add(name, key, value)
+
+        blacklist = self._load_json(os.path.join(folder, 'blacklist.json')) or {}
+        for user_id in blacklist.get('blacklisted') or ():
+            add('blacklist', str(user_id), True)
+
+        config = self._load_json(os.path.join(folder, 'config.json')) or {}
+        for guild_id, prefix in (config.get('PREFIXES') or {}).items():
+            add('prefixes', str(guild_id), prefix)
+
+        self._upsert(rows)
+        self._db.execute("INSERT OR REPLACE INTO meta VALUES ('migrated', ?)", (str(len(rows)),))
+        self._db.commit()
+        print(f'Migrated {len(rows)} entries from {folder}/ into {self.path}')
+
+    def get(self, namespace, key, default=None):
+        return self._data.get(namespace, {}).get(str(key), default)
+
+    def all(self, namespace):
+        '''Every key/value in a namespace, don't mutate it.'''
+        return self._data.get(namespace, {})
+
+    async def set(self, namespace, key, value):
+        key = str(key)
+        self._data.setdefault(namespace, {})[key] = value
+        await self._run(self._upsert, [(namespace, key, json.dumps(value))])
+
+    async def delete(self, namespace, key):
+        key = str(key)
+        self._data.get(namespace, {}).pop(key, None)
+        await self._run(self._delete, namespace, key)
+
+    def close(self):
+        def _close():
+            if self._db is not None:
+                self._db.close()
+                self._db = None
+        self._submit(_close).result()
+        self._executor.shutdown()
@@ -0,0 +1,87 @@
+import time
+
+from collections import deque
+
+from util import metrics
+
+
+PHASES = ('parse', 'checks', 'callback', 'total')
+
+
+def _redact(value):
+    '''Keeps what kind of argument it was, never what it said.'''
+    kind = type(value).__name__
+    if isinstance(value, (str, bytes, list, tuple, dict)):
+        return f'<{kind}:{len(value)}>'
+    return f'<{kind}>'
+
+
+class CommandTimings:
+    '''Per command latency, split into phases.
+
+    parse is process_commands up to the context being built, checks is
+    checks plus argument conversion (up to the before_invoke hook) and
+    callback is the command itself. Every command gets a histogram per
+    phase, anything slower than threshold ms also goes in a bounded slow
+    log with its arguments replaced by their type (and length).
+    '''
+
+    def __init__(self, threshold=2000.0, slow_log=100):
+        self.threshold = threshold
+        self.commands = {}
+        self.slow = deque(maxlen=slow_log)
+        self.total = metrics.histogram('commands')
+
+    def _histograms(self, name):
+        hists = self.commands.get(name)
+        if hists is None:
+            hists = self.commands[name] = {phase: metrics.Histogram(f'{name} {phase}') for phase in PHASES}
+        return hists
+
+    @staticmethod
+    async def mark_callback(linu):
+        '''before_invoke hook, checks and converters are done by the time it runs.'''
+        timings = getattr(linu, 'timings', None)
+        if timings is not None:
+            timings['callback'] = time.perf_counter()
+
+    def record(self, linu, start, parsed):
+        '''Called once the command is done, start and parsed are perf_counter() values.'''
+        done = time.perf_counter()
+        callback = linu.timings.get('callback')
+        hists = self._histograms(linu.command.qualified_name)
+        phases = {'parse': (parsed - start) * 1000, 'total': (done - start) * 1000}
+        if callback is None:
+            # a check or converter failed, the callback never ran
+            phases['checks'] = (done - parsed) * 1000
+        else:
+            phases['checks'] = (callback - parsed) * 1000
+            phases['callback'] = (done - callback) * 1000
+        for phase, ms in phases.items():
+            hists[phase].observe(ms)
+        self.total.observe(phases['total'])
+
+        if phases['total'] >= self.threshold:
+            args = [_redact(arg) for arg in linu.args if arg is not linu and arg is not linu.cog]
+            args += [f'{key}={_redact(value)}' for key, value in linu.kwargs.items()]
+            self.slow.append((time.time(), linu.command.qualified_name, phases, args))
+
+    def slowest(self, n=10, percentile=95):
+        '''(name, histograms) for the n commands with the highest total percentile.'''
+        ranked = sorted(self.commands.items(), key=lambda x: x[1]['total'].percentile(percentile), reverse=True)
+        return ranked[:n]
+
+    def format_slowest(self, n=10):
+        lines = []
+        for name, hists in self.slowest(n):
+            total = hists['total']
+            lines.append(f"{name}: {total.count} runs, p50 {total.percentile(50):.1f}ms "
+                         f"p95 {total.percentile(95):.1f}ms p99 {total.percentile(99):.1f}ms")
+            lines.append('  ' + ' '.join(f'{phase} p95 {hists[phase].percentile(95):.1f}ms'
+                                         for phase in ('parse', 'checks', 'callback')))
+        if self.slow:
+            lines.append(f'\nSlow log (over {self.threshold:.0f}ms), newest first:')
+            for when, name, phases, args in list(self.slow)[:-n - 1:-1]:
+                stamp = time.strftime('%H:%M:%S', time.gmtime(when))
+                lines.append(f"{stamp} {name} {phases['total']:.0f}ms {' '.join(args)}")
+        return '\n'.join(lines)
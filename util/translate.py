@@ -0,0 +1,135 @@
+import asyncio
+import json
+
+from concurrent.futures import ThreadPoolExecutor
+
+from mtranslate import translate as _backend
+
+from util import cache
+from util.langdetect import detector
+
+
+class Languages:
+    '''Language codes and names, looked up either way round (case insensitive).'''
+
+    def __init__(self, names):
+        self.names = dict(names)
+        self._codes = {}
+        for code, name in self.names.items():
+            self._codes[code.lower()] = code
+            self._codes[name.lower()] = code
+
+    @classmethod
+    def from_file(cls, path='data/langs.json'):
+        try:
+            with open(path, encoding='utf8') as f:
+                return cls(json.load(f))
+        except (FileNotFoundError, ValueError):
+            return cls({})
+
+    def resolve(self, lang):
+        '''The code for a code or a language name, None if it's unknown.'''
+        return self._codes.get(lang.strip().lower())
+
+    def __contains__(self, lang):
+        return self.resolve(lang) is not None
+
+
+class Translator:
+    '''Translations without blocking the loop.
+
+    mtranslate is plain urllib, so every request runs on a small worker pool.
+    Results are cached per (text, target), identical requests in flight share
+    one future, and segments asked for within batch_window of each other (for
+    the same target) go out joined in as few backend requests as possible.
+    Text the local detector says is already in the target language is
+    handed straight back without asking the backend at all.
+    '''
+
+    def __init__(self, languages, workers=4, maxsize=1024, ttl=86400, batch_window=0.05, max_batch=1500):
+        self.languages = languages
+        self.batch_window = batch_window
+        self.max_batch = max_batch
+        self.cache = cache.LRUCache(maxsize, ttl=ttl, name='translate')
+        cache.caches.append(self.cache)
+        self.requests = 0
+        self.skipped = 0
+        self._executor = ThreadPoolExecutor(max_workers=workers)
+        self._inflight = {}
+        self._pending = {}
+
+    async def translate(self, text, target):
+        # detect() is None unless it's sure, so anything it doesn't know well still gets translated
+        if detector.detect(text) == target:
+            self.skipped += 1
+            return text
+
+        key = (text, target)
+        res = self.cache.get(key, None)
+        if res is not None:
+            return res
+
+        future = self._inflight.get(key)
+        if future is None:
+            loop = asyncio.get_event_loop()
+            future = self._inflight[key] = loop.create_future()
+            pending = self._pending.setdefault(target, [])
+            if not pending:
+                loop.call_later(self.batch_window, self._flush, target)
+            pending.append(text)
+        else:
+            self.cache.coalesced += 1
+        return await asyncio.shield(future)
+
+    async def translate_many(self, texts, target):
+        return await asyncio.gather(*(self.translate(text, target) for text in texts))
+
+    def _batches(self, texts):
+        # newlines are the separator, so texts that have them go on their own
+        batch, size = [], 0
+        for text in texts:
+            if '\n' in text:
+                yield [text]
+                continue
+            if batch and size + len(text) + 1 > self.max_batch:
+                yield batch
+                batch, size = [], 0
+            batch.append(text)
+            size += len(text) + 1
+        if batch:
+            yield batch
+
+    def _flush(self, target):
+        for batch in self._batches(self._pending.pop(target, [])):
+            asyncio.ensure_future(self._run(batch, target))
+
+    def _call(self, batch, target):
+        self.requests += 1
+        if len(batch) == 1:
+            return [_backend(batch[0], target)]
+        translated = _backend('\n'.join(batch), target).split('\n')
+        if len(translated) != len(batch):
+            # the lines got merged or split, do them one at a time instead
+            self.requests += len(batch)
+            return [_backend(text, target) for text in batch]
+        return translated
+
+    async def _run(self, batch, target):
+        loop = asyncio.get_event_loop()
+        try:
+            results = await loop.run_in_executor(self._executor, self._call, batch, target)
+        except Exception as e:
+            for text in batch:
+                future = self._inflight.pop((text, target))
+                if not future.done():
+                    future.set_exception(e)
+            return
+        for text, res in zip(batch, results):
+            self.cache.set((text, target), res)
+            future = self._inflight.pop((text, target))
+            if not future.done():
+                future.set_result(res)
+
+
+languages = Languages.from_file()
+translator = Translator(languages)
@@ -0,0 +1,86 @@
+import math
+
+
+def _mix(n):
+    # splitmix64 finaliser, snowflakes are far too regular to bucket directly
+    n = (n ^ (n >> 30)) * 0xBF58476D1CE4E5B9 & 0xFFFFFFFFFFFFFFFF
+    n = (n ^ (n >> 27)) * 0x94D049BB133111EB & 0xFFFFFFFFFFFFFFFF
+    return n ^ (n >> 31)
+
+
+class HyperLogLog:
+    '''Approximate distinct count in 2**precision bytes, about 1.04 / sqrt(2**precision) error.'''
+
+    def __init__(self, precision=14):
+        self.precision = precision
+        self.m = 1 << precision
+        self.registers = bytearray(self.m)
+        self.alpha = 0.7213 / (1 + 1.079 / self.m)
+
+    def add(self, n):
+        h = _mix(n)
+        idx = h >> (64 - self.precision)
+        rest = h & ((1 << (64 - self.precision)) - 1)
+        rank = 64 - self.precision - rest.bit_length() + 1
+        if rank > self.registers[idx]:
+            self.registers[idx] = rank
+
+    def clear(self):
+        self.registers = bytearray(self.m)
+
+    def __len__(self):
+        estimate = self.alpha * self.m * self.m / sum(2.0 ** -r for r in self.registers)
+        zeros = self.registers.count(0)
+        if estimate <= 2.5 * self.m and zeros:
+            # small range correction
+            estimate = self.m * math.log(self.m / zeros)
+        return int(round(estimate))
+
+
+class UserCounter:
+    '''Unique users across every guild the bot is in, kept up to date from events.
+
+    Every user has a count of the guilds they share with the bot, joins and
+    leaves only touch that one number so the total is always len() of the
+    dict. hyperloglog=True swaps the dict for a fixed 16KB sketch, the total
+    is then an estimate (within a percent or so) and can't go down until the
+    next rebuild(), since a sketch can't forget anyone.
+    '''
+
+    def __init__(self, hyperloglog=False):
+        self.hyperloglog = hyperloglog
+        self._refs = HyperLogLog() if hyperloglog else {}
+
+    def add(self, user_id):
+        if self.hyperloglog:
+            self._refs.add(user_id)
+        else:
+            self._refs[user_id] = self._refs.get(user_id, 0) + 1
+
+    def remove(self, user_id):
+        if self.hyperloglog:
+            return
+        refs = self._refs.get(user_id)
+        if refs is None:
+            return
+        if refs <= 1:
+            del self._refs[user_id]
+        else:
+            self._refs[user_id] = refs - 1
+
+    def add_guild(self, guild):
+        for member in guild.members:
+            self.add(member.id)
+
+    def remove_guild(self, guild):
+        for member in guild.members:
+            self.remove(member.id)
+
+    def rebuild(self, guilds):
+        '''Recounts from scratch, only needed once the member cache is filled (on_ready).'''
+        self._refs = HyperLogLog() if self.hyperloglog else {}
+        for guild in guilds:
+            self.add_guild(guild)
+
+    def __len__(self):
+        return len(self._refs)